@@ -0,0 +1,128 @@
+from cache import ResultCache
+from concurrent.futures import ProcessPoolExecutor
+from expression import parse_function
+import instrument
+import integral
+import contextlib
+import csv
+import json
+import sys
+
+FIELDS = ["expression", "a", "b", "method", "rectangles", "tolerance", "seed", "result", "error_bound", "evaluations", "failure"]
+
+"""
+ Reads integration jobs one at a time
+    Args:
+        stream: An open text file with one JSON object per line or a CSV file with a header row
+        format: Either "jsonl" or "csv"
+    Returns:
+        A generator of dictionaries with the fields of every job, blank lines are skipped
+"""
+def read_jobs(stream, format):
+  if format == "csv":
+    for row in csv.DictReader(stream):
+      yield row
+  else:
+    for line in stream:
+      if line.strip():
+        yield json.loads(line)
+
+"""
+ Converts a field of a job into a number
+    Args:
+        value: The value of the field as read from the file
+        kind: Either int or float
+    Returns:
+        The number, or None when the field is missing or empty
+"""
+def to_number(value, kind):
+  if value is None or value == "":
+    return None
+  return kind(value)
+
+"""
+ Integrates every job and produces its result as soon as it is ready
+    Args:
+        jobs: An iterable of dictionaries with the fields "expression", "a", "b", "method" and either "rectangles", "tolerance" or both, and
+        optionally "seed" for the Monte Carlo methods
+        workers: An optional positive integer, the number of worker processes used by the uniform rules
+        chunk_size: A positive integer that represents the number of points each worker evaluates at a time
+        cache: An optional cache.ResultCache that remembers the results of the jobs
+    Returns:
+        A generator of dictionaries with the fields of the job plus "result", "error_bound" and "evaluations" when they are known, or
+        "failure" with the reason the job could not be integrated. Complex results, such as those of x^0.5 over negative numbers, are
+        written as a string like "(1e-17+0.6666j)", since JSON has no complex numbers
+    Notes:
+        Expressions are parsed through the bounded cache of parse_function, so a file with many repeated expressions parses each of
+        them once and memory does not grow with the size of the file
+        The worker processes are started once and shared by all of the jobs
+"""
+def integrate_jobs(jobs, workers=None, chunk_size=integral.CHUNK_SIZE, cache=None):
+  with ProcessPoolExecutor(workers) if workers is not None else contextlib.nullcontext() as pool:
+    yield from integrate_pooled(jobs, pool, chunk_size, cache)
+
+"""
+ Integrates every job with the worker processes that were already started, see integrate_jobs
+"""
+def integrate_pooled(jobs, pool, chunk_size, cache):
+  for job in jobs:
+    output = dict(job)
+    try:
+      function = parse_function(job["expression"])
+      if function.variables() != ['x'] and function.variables() != []:
+        raise ValueError("The expression should only contain 'x' as a variable")
+
+      results = integral.integrate(function, float(job["a"]), float(job["b"]), job.get("method", "simpson"), to_number(job.get("rectangles"), int), to_number(job.get("tolerance"), float), pool, chunk_size, cache, to_number(job.get("seed"), int))
+      for name, value in results.items():
+        if name == "evaluations":
+          output[name] = int(value)
+        else:
+          output[name] = str(value) if isinstance(value, complex) else float(value)
+    except Exception as error:
+      output["failure"] = str(error) or type(error).__name__
+    yield output
+
+"""
+ Integrates a file of jobs and writes the results incrementally
+    Args:
+        jobs_path: The path of the file with the jobs, or '-' for standard input
+        output_path: The path of the file where the results are written, or '-' for standard output
+        format: Either "jsonl" or "csv" for both the jobs and the results, guessed from the extension of jobs_path when None
+        workers: An optional positive integer, the number of worker processes used by the uniform rules
+        chunk_size: A positive integer that represents the number of points each worker evaluates at a time
+        show_profile: A boolean, when True a breakdown of the time and function evaluations of every job is printed to standard error
+        cache_path: An optional path of a SQLite file where results are remembered between runs, they are only remembered during this run otherwise
+        cache_ttl: An optional number of seconds after which remembered results are computed again
+"""
+def run(jobs_path, output_path, format=None, workers=None, chunk_size=integral.CHUNK_SIZE, show_profile=False, cache_path=None, cache_ttl=None):
+  if format is None:
+    format = "csv" if jobs_path.lower().endswith(".csv") else "jsonl"
+
+  source = sys.stdin if jobs_path == "-" else open(jobs_path, newline="")
+  sink = sys.stdout if output_path == "-" else open(output_path, "w", newline="")
+  cache = ResultCache(ttl=cache_ttl, path=cache_path)
+
+  try:
+    if format == "csv":
+      writer = csv.DictWriter(sink, FIELDS, extrasaction="ignore")
+      writer.writeheader()
+    jobs = integrate_jobs(read_jobs(source, format), workers, chunk_size, cache)
+    while True:
+      with instrument.profile() if show_profile else contextlib.nullcontext() as report:
+        output = next(jobs, None)
+      if output is None:
+        break
+
+      if format == "csv":
+        writer.writerow(output)
+      else:
+        sink.write(json.dumps(output) + "\n")
+      sink.flush()
+      if show_profile:
+        print(report.format() + "\n", file=sys.stderr)
+  finally:
+    cache.close()
+    if source is not sys.stdin:
+      source.close()
+    if sink is not sys.stdout:
+      sink.close()
@@ -0,0 +1,117 @@
+from expression import parse_function
+import integral
+import numpy
+import argparse
+import json
+import math
+import platform
+import time
+import tracemalloc
+
+# Every expression with its interval and the exact value of its integral
+EXPRESSIONS = {
+  "polynomial": ("3x^3-2x^2+x-5", 0, 2, 3 * 2 ** 4 / 4 - 2 * 2 ** 3 / 3 + 2 ** 2 / 2 - 5 * 2),
+  "trigonometric": ("sin(x)+cos(2x)", 0, 1, 1 - math.cos(1) + math.sin(2) / 2),
+  "exp_log": ("exp(x)+ln(x)", 1, 2, math.exp(2) - math.exp(1) + 2 * math.log(2) - 1),
+  "discontinuous": ("abs(x-1)+floor(x)", 0, 2.5, 1.625 + 2),
+}
+BENCHMARK_RULES = integral.RULES + ["tolerance"]
+TOLERANCE = 1e-6
+
+"""
+ Runs one estimation of a benchmark case
+    Args:
+        function: A py_expression expression
+        a: A float number that represents the left bound of integration
+        b: A float number that represents the right bound of integration
+        rule: One of BENCHMARK_RULES
+        rectangles: A positive integer, the number of rectangles of the uniform rules and the initial rectangles of "tolerance"
+    Returns:
+        The estimation of the integral and the number of times the function was evaluated
+"""
+def run_case(function, a, b, rule, rectangles):
+  if rule == "tolerance":
+    result, error, evaluations = integral.left_right_refine(function, a, b, rectangles, TOLERANCE, integral.MAX_EVALUATIONS)
+    return result, evaluations
+
+  result = integral.estimate(function, a, b, rectangles, [rule])[rule]
+  if rule in ["left", "right", "midpoint"]:
+    return result, rectangles
+  elif rule == "trapezium":
+    return result, rectangles + 1
+  return result, 2 * rectangles + 1
+
+"""
+ Measures one benchmark case
+    Args:
+        name: The name of the expression in EXPRESSIONS
+        rule: One of BENCHMARK_RULES
+        rectangles: A positive integer, the number of rectangles
+        repeat: A positive integer, the number of timed runs, the fastest one is reported
+    Returns:
+        A dictionary with the case, its wall time in seconds, its evaluations per second, its peak memory in bytes and its absolute error
+"""
+def measure(name, rule, rectangles, repeat):
+  text, a, b, exact = EXPRESSIONS[name]
+  function = parse_function(text)
+
+  wall_time = float("inf")
+  for _ in range(repeat):
+    start = time.perf_counter()
+    result, evaluations = run_case(function, a, b, rule, rectangles)
+    wall_time = min(wall_time, time.perf_counter() - start)
+
+  tracemalloc.start()
+  run_case(function, a, b, rule, rectangles)
+  peak_memory = tracemalloc.get_traced_memory()[1]
+  tracemalloc.stop()
+
+  return {
+    "expression": name,
+    "rule": rule,
+    "rectangles": rectangles,
+    "evaluations": evaluations,
+    "wall_time": wall_time,
+    "evaluations_per_second": evaluations / wall_time if wall_time > 0 else None,
+    "peak_memory": peak_memory,
+    "error": abs(float(result) - exact),
+  }
+
+"""
+ Runs the benchmark matrix from the command line and saves the results as JSON
+    Args:
+        argv: A list with the command line arguments, by default the ones the program was run with
+"""
+def main(argv=None):
+  parser = argparse.ArgumentParser(description="Benchmarks the rules of My Integral Estimator")
+  parser.add_argument("-o", "--output", default="benchmark.json", help="file where the results are saved")
+  parser.add_argument("--rules", nargs="+", choices=BENCHMARK_RULES, default=BENCHMARK_RULES)
+  parser.add_argument("--expressions", nargs="+", choices=list(EXPRESSIONS), default=list(EXPRESSIONS))
+  parser.add_argument("--max-exponent", type=int, default=7, help="the largest number of rectangles is 10 to this power, the smallest is 10^2")
+  parser.add_argument("--repeat", type=int, default=3, help="number of timed runs of every case")
+  args = parser.parse_args(argv)
+
+  results = []
+  print("%-14s %-10s %10s %12s %16s %14s %12s" % ("expression", "rule", "rectangles", "time (s)", "evaluations/s", "peak memory", "error"))
+  for name in args.expressions:
+    for rule in args.rules:
+      for exponent in range(2, args.max_exponent + 1):
+        case = measure(name, rule, 10 ** exponent, args.repeat)
+        results.append(case)
+        print("%-14s %-10s %10d %12.6f %16.0f %14d %12.3e" % (name, rule, case["rectangles"], case["wall_time"], case["evaluations_per_second"] or 0, case["peak_memory"], case["error"]))
+
+  report = {
+    "python": platform.python_version(),
+    "numpy": numpy.__version__,
+    "machine": platform.machine(),
+    "system": platform.system(),
+    "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    "repeat": args.repeat,
+    "results": results,
+  }
+  with open(args.output, "w") as output:
+    json.dump(report, output, indent=1, sort_keys=True)
+  print("\nResults saved to", args.output)
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,103 @@
+from collections import OrderedDict
+import json
+import sqlite3
+import time
+
+"""
+ Remembers the results of integrals in memory, optionally backed by a SQLite file that survives between sessions
+    Notes:
+        Keys are tuples of numbers and strings, such as the canonical expression string returned by toString(), the bounds, the method
+        and the number of rectangles. Values are dictionaries of numbers, as returned by integral.integrate.
+        The least recently used entries are evicted once there are more than capacity of them in memory or disk_capacity of them on
+        disk, and entries older than ttl seconds are never returned.
+"""
+class ResultCache:
+  def __init__(self, capacity=1024, ttl=None, path=None, disk_capacity=100000):
+    self.capacity = capacity
+    self.ttl = ttl
+    self.disk_capacity = disk_capacity
+    self.entries = OrderedDict()
+    self.hits = 0
+    self.misses = 0
+    self.connection = None
+
+    if path is not None:
+      self.connection = sqlite3.connect(path)
+      self.connection.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL, used_at REAL NOT NULL)")
+      self.connection.commit()
+
+  """
+   Looks up a result
+      Args:
+          key: A tuple that identifies the integral
+      Returns:
+          The dictionary stored under key, or None when there is none or it expired
+  """
+  def get(self, key):
+    now = time.time()
+    text = json.dumps(key)
+
+    if text in self.entries:
+      value, stored_at = self.entries[text]
+      if self.ttl is None or now - stored_at <= self.ttl:
+        self.entries.move_to_end(text)
+        self.hits += 1
+        return dict(value)
+      del self.entries[text]
+
+    if self.connection is not None:
+      row = self.connection.execute("SELECT value, stored_at FROM results WHERE key = ?", (text,)).fetchone()
+      if row is not None:
+        if self.ttl is None or now - row[1] <= self.ttl:
+          self.connection.execute("UPDATE results SET used_at = ? WHERE key = ?", (now, text))
+          self.connection.commit()
+          value = json.loads(row[0])
+          self.remember(text, value, row[1])
+          self.hits += 1
+          return dict(value)
+        self.connection.execute("DELETE FROM results WHERE key = ?", (text,))
+        self.connection.commit()
+
+    self.misses += 1
+    return None
+
+  """
+   Stores a result
+      Args:
+          key: A tuple that identifies the integral
+          value: A dictionary of numbers, it is not stored when some of them are complex
+  """
+  def put(self, key, value):
+    if any(isinstance(number, complex) for number in value.values()):
+      return
+
+    now = time.time()
+    text = json.dumps(key)
+    value = {name: (int(number) if name == "evaluations" else float(number)) for name, number in value.items()}
+    self.remember(text, value, now)
+
+    if self.connection is not None:
+      self.connection.execute("INSERT OR REPLACE INTO results (key, value, stored_at, used_at) VALUES (?, ?, ?, ?)", (text, json.dumps(value), now, now))
+      self.connection.execute("DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY used_at DESC LIMIT -1 OFFSET ?)", (self.disk_capacity,))
+      if self.ttl is not None:
+        self.connection.execute("DELETE FROM results WHERE stored_at < ?", (now - self.ttl,))
+      self.connection.commit()
+
+  def remember(self, text, value, stored_at):
+    self.entries[text] = (value, stored_at)
+    self.entries.move_to_end(text)
+    while len(self.entries) > self.capacity:
+      self.entries.popitem(last=False)
+
+  """
+   Reports how well the cache is doing
+      Returns:
+          A dictionary with the number of "hits" and "misses" and the number of entries in memory under "size"
+  """
+  def statistics(self):
+    return {"hits": self.hits, "misses": self.misses, "size": len(self.entries)}
+
+  def close(self):
+    if self.connection is not None:
+      self.connection.close()
+      self.connection = None
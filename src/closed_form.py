@@ -0,0 +1,316 @@
+from py_expression_eval import TNUMBER, TOP1, TOP2, TVAR, TFUNCALL
+import math
+import weakref
+
+# Largest integer power of a sum that is expanded, and most terms an expansion may have
+MAX_POWER = 32
+MAX_TERMS = 256
+
+_analyses = weakref.WeakKeyDictionary()
+
+"""
+ Marks the name of a function that is about to be called, such as log
+"""
+class _Call:
+  def __init__(self, name):
+    self.name = name
+
+"""
+ Reads a combination that does not depend on x
+    Args:
+        terms: A dictionary of terms, as returned by analyze
+    Returns:
+        The constant as a float number, or None when terms depend on x
+"""
+def constant(terms):
+  if terms is None or any(key != ("power", 0) for key in terms):
+    return None
+  return terms.get(("power", 0), 0.0)
+
+"""
+ Reads a combination of the form a*x + b
+    Args:
+        terms: A dictionary of terms, as returned by analyze
+    Returns:
+        A tuple (a, b) with a different from zero, or None when terms are not of that form
+"""
+def affine(terms):
+  if terms is None or any(key not in [("power", 0), ("power", 1)] for key in terms) or ("power", 1) not in terms:
+    return None
+  return terms[("power", 1)], terms.get(("power", 0), 0.0)
+
+def _collect(pairs):
+  terms = {}
+  for key, coefficient in pairs:
+    terms[key] = terms.get(key, 0.0) + coefficient
+  terms = {key: coefficient for key, coefficient in terms.items() if coefficient != 0}
+  return terms if len(terms) <= MAX_TERMS else None
+
+def _scale(terms, factor):
+  return _collect((key, coefficient * factor) for key, coefficient in terms.items())
+
+def _add(left, right, sign=1):
+  if left is None or right is None:
+    return None
+  return _collect(list(left.items()) + [(key, sign * coefficient) for key, coefficient in right.items()])
+
+def _product(first, second):
+  if first == ("power", 0):
+    return second, 1.0
+  if second == ("power", 0):
+    return first, 1.0
+  if first[0] == "power" and second[0] == "power":
+    return ("power", first[1] + second[1]), 1.0
+  if first[0] == "exp" and second[0] == "exp":
+    if first[1] + second[1] == 0:
+      return ("power", 0), math.exp(first[2] + second[2])
+    return ("exp", first[1] + second[1], first[2] + second[2]), 1.0
+  return None
+
+def _multiply(left, right):
+  if left is None or right is None:
+    return None
+  pairs = []
+  for first, a in left.items():
+    for second, b in right.items():
+      product = _product(first, second)
+      if product is None:
+        return None
+      pairs.append((product[0], a * b * product[1]))
+  return _collect(pairs)
+
+def _reciprocal(terms, constraints):
+  if terms is None or len(terms) != 1:
+    return None
+  (key, coefficient), = terms.items()
+  if key[0] == "power":
+    if key[1] != 0:
+      constraints.add(("nonzero", 1.0, 0.0))
+    return {("power", -key[1]): 1 / coefficient}
+  if key[0] == "exp":
+    return {("exp", -key[1], -key[2]): 1 / coefficient}
+  return None
+
+def _inverse(terms, constraints):
+  line = affine(terms)
+  if line is None or line[1] == 0:
+    return _reciprocal(terms, constraints)
+  constraints.add(("nonzero", line[0], line[1]))
+  return {("inverse", line[0], line[1]): 1.0}
+
+def _power(base, exponent, constraints):
+  n = constant(exponent)
+  c = constant(base)
+  if n is None:
+    line = affine(exponent)
+    if c is None or c <= 0 or line is None:
+      return None
+    if c == 1:
+      return {("power", 0): 1.0}
+    return {("exp", line[0] * math.log(c), line[1] * math.log(c)): 1.0}
+  if base is None:
+    return None
+  if c is not None:
+    return {("power", 0): math.pow(c, n)} if c != 0 or n > 0 else None
+  if float(n).is_integer() and 0 <= n <= MAX_POWER:
+    result = {("power", 0): 1.0}
+    for _ in range(int(n)):
+      result = _multiply(result, base)
+    return result
+  if n == -1:
+    return _inverse(base, constraints)
+  if len(base) != 1:
+    return None
+
+  (key, coefficient), = base.items()
+  if key == ("power", 1) and (coefficient > 0 or float(n).is_integer()):
+    if not float(n).is_integer():
+      constraints.add(("nonnegative", 1.0, 0.0))
+    if n < 0:
+      constraints.add(("nonzero", 1.0, 0.0))
+    return {("power", n): math.pow(coefficient, n)}
+  if key[0] == "exp" and coefficient > 0:
+    return {("exp", key[1] * n, key[2] * n): math.pow(coefficient, n)}
+  return None
+
+def _unary(name, terms, constraints):
+  if name == '-':
+    return _scale(terms, -1) if terms is not None else None
+  if name == "sqrt":
+    return _power(terms, {("power", 0): 0.5}, constraints)
+  line = affine(terms)
+  if name in ["exp", "sin", "cos"] and line is not None:
+    return {(name, line[0], line[1]): 1.0}
+  return None
+
+def _binary(operator, left, right, constraints):
+  if operator == '+':
+    return _add(left, right)
+  if operator == '-':
+    return _add(left, right, -1)
+  if operator == '*':
+    return _multiply(left, right)
+  if operator == '/':
+    return _multiply(left, _inverse(right, constraints))
+  if operator == '^':
+    return _power(left, right, constraints)
+  return None
+
+"""
+ Recognizes a function that is a linear combination of terms with a known antiderivative
+    Args:
+        function: A py_expression expression, already simplified as parse_function does
+    Returns:
+        A tuple with a dictionary that maps every term to its coefficient and a set with the conditions on x under which the
+        function is defined, or None when the function is not such a combination. The terms are ("power", p) for x^p,
+        ("exp", a, b), ("sin", a, b) and ("cos", a, b) for exp(a*x + b), sin(a*x + b) and cos(a*x + b), and ("log", a, b) and
+        ("inverse", a, b) for log(a*x + b) and 1/(a*x + b). The conditions are ("nonnegative", a, b) and ("nonzero", a, b) for
+        a*x + b >= 0 and a*x + b != 0.
+    Notes:
+        Walks the tokens of the expression like compile_function does, building the combination of every subexpression. Sums,
+        differences, products and quotients are expanded as long as the result is still such a combination, so (x+1)^2/x or
+        2^x*exp(x) are recognized but x*exp(x) or sin(x)^2 are not. The conditions of every subexpression are kept even when
+        its terms cancel or merge, so sqrt(x)^2 is x only for x >= 0 and x/x is 1 only for x != 0. The analysis of every function
+        is remembered.
+"""
+def analyze(function):
+  try:
+    return _analyses[function]
+  except KeyError:
+    pass
+
+  stack = []
+  constraints = set()
+  try:
+    for token in function.tokens:
+      if token.type_ == TNUMBER:
+        if type(token.number_) not in [int, float]:
+          stack.append(None)
+        else:
+          stack.append({("power", 0): float(token.number_)} if token.number_ != 0 else {})
+
+      elif token.type_ == TVAR:
+        if token.index_ == 'x':
+          stack.append({("power", 1): 1.0})
+        elif token.index_ in function.functions:
+          stack.append(_Call(token.index_))
+        else:
+          stack.append(None)
+
+      elif token.type_ == TOP1:
+        stack.append(_unary(token.index_, stack.pop(), constraints))
+
+      elif token.type_ == TOP2:
+        right = stack.pop()
+        left = stack.pop()
+        if isinstance(left, _Call) or isinstance(right, _Call) or token.index_ == ',':
+          stack.append(None)
+        else:
+          stack.append(_binary(token.index_, left, right, constraints))
+
+      elif token.type_ == TFUNCALL:
+        argument = stack.pop()
+        call = stack.pop()
+        line = affine(argument) if not isinstance(argument, _Call) else None
+        if isinstance(call, _Call) and call.name == "log" and line is not None:
+          constraints.add(("nonnegative", line[0], line[1]))
+          stack.append({("log", line[0], line[1]): 1.0})
+        else:
+          stack.append(None)
+
+      else:
+        stack.append(None)
+  except (IndexError, OverflowError, ValueError, ZeroDivisionError):
+    stack = [None]
+
+  analysis = (stack[0], frozenset(constraints)) if len(stack) == 1 and isinstance(stack[0], dict) else None
+  _analyses[function] = analysis
+  return analysis
+
+"""
+ Checks that the antiderivative of a term can be used over a whole interval
+    Args:
+        key: A term, as described in analyze
+        lower: The smallest point of the interval
+        higher: The largest point of the interval
+    Returns:
+        True when the term is finite inside the interval and its antiderivative is continuous over it
+"""
+def defined(key, lower, higher):
+  if key[0] == "power":
+    p = key[1]
+    if float(p).is_integer():
+      return p >= 0 or lower > 0 or higher < 0
+    return lower > 0 or (p > 0 and lower >= 0)
+  if key[0] == "log":
+    return min(key[1] * lower + key[2], key[1] * higher + key[2]) >= 0
+  if key[0] == "inverse":
+    return (key[1] * lower + key[2]) * (key[1] * higher + key[2]) > 0
+  return True
+
+"""
+ Checks that a condition found by analyze holds over a whole interval
+    Args:
+        condition: A tuple ("nonnegative", a, b) or ("nonzero", a, b), as described in analyze
+        lower: The smallest point of the interval
+        higher: The largest point of the interval
+    Returns:
+        True when a*x + b is non-negative, or never zero, at every point of the interval, bounds included
+"""
+def satisfied(condition, lower, higher):
+  kind, a, b = condition
+  if kind == "nonnegative":
+    return min(a * lower + b, a * higher + b) >= 0
+  return (a * lower + b) * (a * higher + b) > 0
+
+"""
+ Evaluates the antiderivative of a term
+    Args:
+        key: A term, as described in analyze
+        t: A float number inside an interval where the term is defined
+    Returns:
+        The value at t of an antiderivative of the term
+"""
+def antiderivative(key, t):
+  if key[0] == "power":
+    if key[1] == -1:
+      return math.log(math.fabs(t))
+    return t ** (key[1] + 1) / (key[1] + 1)
+
+  name, a, b = key
+  u = a * t + b
+  if name == "exp":
+    return math.exp(u) / a
+  if name == "sin":
+    return -math.cos(u) / a
+  if name == "cos":
+    return math.sin(u) / a
+  if name == "inverse":
+    return math.log(math.fabs(u)) / a
+  return (u * math.log(u) - u) / a if u > 0 else 0.0
+
+"""
+ Integrates a function exactly when analyze recognizes it
+    Args:
+        function: A py_expression expression
+        a: A float number that represents the left bound of integration
+        b: A float number that represents the right bound of integration
+    Returns:
+        The integral as a float number, or None when the function has no recognized antiderivative over (a, b), in which case it
+        has to be estimated numerically
+    Notes:
+        Takes the same time whatever the bounds are, the function is never evaluated
+"""
+def closed_form(function, a, b):
+  analysis = analyze(function)
+  if analysis is None:
+    return None
+  terms, conditions = analysis
+  lower, higher = min(a, b), max(a, b)
+  if not all(defined(key, lower, higher) for key in terms) or not all(satisfied(condition, lower, higher) for condition in conditions):
+    return None
+  try:
+    result = math.fsum(coefficient * (antiderivative(key, b) - antiderivative(key, a)) for key, coefficient in terms.items())
+  except (OverflowError, ValueError, ZeroDivisionError):
+    return None
+  return result if math.isfinite(result) else None
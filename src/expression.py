@@ -0,0 +1,253 @@
+from py_expression_eval import Parser, TNUMBER, TOP1, TOP2, TVAR, TFUNCALL
+import instrument
+import functools
+import math
+import threading
+import weakref
+import numpy
+
+UNARY = {
+  'sin': numpy.sin,
+  'cos': numpy.cos,
+  'tan': numpy.tan,
+  'asin': numpy.arcsin,
+  'acos': numpy.arccos,
+  'atan': numpy.arctan,
+  'sqrt': numpy.sqrt,
+  'abs': numpy.absolute,
+  'ceil': numpy.ceil,
+  'floor': numpy.floor,
+  'round': numpy.round,
+  'exp': numpy.exp,
+  '-': numpy.negative,
+}
+
+BINARY = {
+  '+': numpy.add,
+  '-': numpy.subtract,
+  '*': numpy.multiply,
+  '/': numpy.true_divide,
+  '%': numpy.mod,
+  '^': numpy.power,
+}
+
+"""
+ Natural log (one argument) or log in a given base (two arguments) as a NumPy ufunc pipeline
+"""
+def _log(value, base=None):
+  if base is None:
+    return numpy.log(value)
+  return numpy.log(value) / numpy.log(base)
+
+CALLS = {
+  'log': _log,
+  'pow': numpy.power,
+  'min': numpy.minimum,
+  'max': numpy.maximum,
+}
+
+KEYWORDS = ["sin", "cos", "tan", "asin", "acos", "atan", "x", "log", "exp", "ceil", "floor", "abs"]
+NUMBERS = ["1", "2", "3", "4", "5", "6", "7", "8", "9", "0", "E", "PI", "x"]
+
+PARSED_EXPRESSIONS = 512
+
+_kernels = weakref.WeakKeyDictionary()
+_parser = Parser()
+_parser_lock = threading.Lock()
+
+"""
+ Rewrites an expression typed by a person into the syntax understood by py_expression_eval
+    Args:
+        text: A string with the expression as typed by the user
+    Returns:
+        A string with the normalized expression
+    Notes:
+        Spaces are removed, arcsin, ln, pi, e and similar spellings are translated, xx becomes x*x and the multiplication signs
+        omitted after numbers, e, pi and x are added back
+        The last PARSED_EXPRESSIONS distinct texts are cached, since a person or a file of jobs tends to repeat the same few
+"""
+@functools.lru_cache(maxsize=PARSED_EXPRESSIONS)
+def normalize_expression(text):
+  text = text.replace(" ","").replace("arcsin", "asin").replace("arccos", "acos").replace("arctan", "atan").replace("ln", "log").replace("pi", "PI").replace("e", "E").replace("cEil", "ceil").replace("Exp", "exp").replace("xx", "x*x")
+
+  for keyword in KEYWORDS:
+    for number in NUMBERS:
+      text = text.replace(number + keyword, number + "*" + keyword)
+      text = text.replace(number + '(', number + "*" + '(')
+
+  return text
+
+"""
+ Parses an expression that is already normalized
+    Args:
+        text: A string with an expression as returned by normalize_expression
+    Returns:
+        A simplified py_expression expression
+    Notes:
+        The last PARSED_EXPRESSIONS distinct expressions are cached, so the same text always gives back the same expression object.
+        The expressions returned are shared and should not be modified.
+        All calls share one parser, which keeps its state while parsing, so it is used by one thread at a time.
+"""
+@functools.lru_cache(maxsize=PARSED_EXPRESSIONS)
+def parse_normalized(text):
+  with _parser_lock:
+    return _parser.parse(text).simplify({})
+
+"""
+ Parses an expression typed by a person
+    Args:
+        text: A string with the expression as typed by the user
+    Returns:
+        A simplified py_expression expression
+    Notes:
+        Raises an exception when the text is not a valid expression. The variables of the expression are not checked.
+        Expressions that normalize to the same text are only parsed once, see parse_normalized
+"""
+def parse_function(text):
+  return parse_normalized(normalize_expression(text))
+
+"""
+ Reports how well the cache of parsed expressions is doing
+    Returns:
+        A dictionary with the number of "hits" and "misses" of the cache, its "size" and its "capacity"
+"""
+def parse_statistics():
+  info = parse_normalized.cache_info()
+  return {"hits": info.hits, "misses": info.misses, "size": info.currsize, "capacity": info.maxsize}
+
+"""
+ Marker left on the compilation stack by a function name until its call token shows up
+"""
+class _Call:
+  def __init__(self, name):
+    self.name = name
+
+"""
+ Argument list built by the ',' operator
+"""
+class _Arguments:
+  def __init__(self, items):
+    self.items = items
+
+def _number(value):
+  return lambda values: value
+
+def _variable(name):
+  return lambda values: values[name]
+
+def _unary(ufunc, operand):
+  return lambda values: ufunc(operand(values))
+
+def _binary(ufunc, left, right):
+  return lambda values: ufunc(left(values), right(values))
+
+def _call(f, operands):
+  return lambda values: f(*[operand(values) for operand in operands])
+
+"""
+ Compiles a py_expression expression into a vectorized NumPy kernel
+    Args:
+        function: A py_expression expression
+    Returns:
+        A callable that takes a dictionary mapping every variable to a number or a NumPy array and returns the values of the function
+        element by element, or None when the expression uses something that has no NumPy counterpart
+    Notes:
+        The kernel mirrors the token stack walk of py_expression_eval, but every operator is applied to whole arrays at once
+"""
+def compile_function(function):
+  stack = []
+  try:
+    for token in function.tokens:
+      if token.type_ == TNUMBER:
+        if type(token.number_) not in [int, float]:
+          return None
+        stack.append(_number(float(token.number_)))
+
+      elif token.type_ == TVAR:
+        if token.index_ in CALLS:
+          stack.append(_Call(token.index_))
+        elif token.index_ in function.functions:
+          return None
+        else:
+          stack.append(_variable(token.index_))
+
+      elif token.type_ == TOP1:
+        if token.index_ not in UNARY:
+          return None
+        stack.append(_unary(UNARY[token.index_], stack.pop()))
+
+      elif token.type_ == TOP2:
+        right = stack.pop()
+        left = stack.pop()
+        if token.index_ == ',':
+          items = left.items if isinstance(left, _Arguments) else [left]
+          stack.append(_Arguments(items + [right]))
+        elif token.index_ in BINARY:
+          stack.append(_binary(BINARY[token.index_], left, right))
+        else:
+          return None
+
+      elif token.type_ == TFUNCALL:
+        arguments = stack.pop()
+        call = stack.pop()
+        if not isinstance(call, _Call):
+          return None
+        operands = arguments.items if isinstance(arguments, _Arguments) else [arguments]
+        stack.append(_call(CALLS[call.name], operands))
+
+      else:
+        return None
+  except IndexError:
+    return None
+
+  if len(stack) != 1 or isinstance(stack[0], (_Call, _Arguments)):
+    return None
+  return stack[0]
+
+"""
+ Obtains the compiled kernel of a function, compiling it the first time it is seen
+    Args:
+        function: A py_expression expression
+    Returns:
+        The kernel built by compile_function, or None if the function cannot be compiled
+"""
+def get_kernel(function):
+  try:
+    return _kernels[function]
+  except KeyError:
+    kernel = compile_function(function)
+    _kernels[function] = kernel
+    return kernel
+
+"""
+ Evaluates a function of 'x' over a whole array of points in one call
+    Args:
+        function: A py_expression expression
+        points: A NumPy array with the points where the function will be evaluated
+        parameters: An optional dictionary that maps the other variables of the function to numbers or NumPy arrays, which are
+        broadcast against points
+    Returns:
+        A NumPy array with the value of the function at every point, with the broadcast shape of points and parameters
+    Notes:
+        Falls back to evaluating point by point with py_expression_eval when the function cannot be compiled or when the kernel
+        produces a value that is not finite, so domain errors, divisions by zero and complex results behave exactly as before
+"""
+def sample(function, points, parameters=None):
+  values = {'x': points} if parameters is None else dict(parameters, x=points)
+  shape = numpy.broadcast_shapes(*[numpy.shape(value) for value in values.values()])
+  if instrument.enabled:
+    instrument.count(math.prod(shape))
+
+  kernel = get_kernel(function)
+  if kernel is not None and all(variable in values for variable in function.variables()):
+    with numpy.errstate(all='ignore'):
+      result = numpy.broadcast_to(kernel(values), shape)
+    if numpy.all(numpy.isfinite(result)):
+      return result
+
+  if parameters is None:
+    return numpy.array([function.evaluate({'x': float(point)}) for point in points])
+
+  names = list(values)
+  grids = [grid.ravel() for grid in numpy.broadcast_arrays(*values.values())]
+  return numpy.array([function.evaluate(dict(zip(names, map(float, point)))) for point in zip(*grids)]).reshape(shape)
@@ -0,0 +1,148 @@
+import contextlib
+import functools
+import threading
+import time
+
+# True while a profile is open or a listener is registered, everything below is skipped otherwise
+enabled = False
+
+_profiles = []
+_listeners = []
+_local = threading.local()
+
+"""
+ One call to a timed function, with the calls it made to other timed functions
+"""
+class Record:
+  def __init__(self, name):
+    self.name = name
+    self.seconds = 0
+    self.evaluations = 0
+    self.children = []
+
+"""
+ Everything measured while a profile is open
+"""
+class Profile:
+  def __init__(self):
+    self.calls = []
+    self.evaluations = 0
+
+  """
+   Adds up the records of every timed function
+      Returns:
+          A dictionary that maps the name of every timed function to a dictionary with its number of "calls", the "seconds" spent
+          inside of it, the "self_seconds" spent outside of the timed functions it called and the function "evaluations" made
+  """
+  def breakdown(self):
+    totals = {}
+    pending = list(self.calls)
+    while pending:
+      record = pending.pop()
+      total = totals.setdefault(record.name, {"calls": 0, "seconds": 0, "self_seconds": 0, "evaluations": 0})
+      total["calls"] += 1
+      total["seconds"] += record.seconds
+      total["self_seconds"] += record.seconds - sum(child.seconds for child in record.children)
+      total["evaluations"] += record.evaluations
+      pending.extend(record.children)
+    return totals
+
+  """
+   Describes the profile as a table with one row per timed function
+      Returns:
+          A string ready to be printed
+  """
+  def format(self):
+    lines = ["%-22s %8s %12s %12s %14s" % ("function", "calls", "time (s)", "self (s)", "evaluations")]
+    for name, total in sorted(self.breakdown().items(), key=lambda item: -item[1]["seconds"]):
+      lines.append("%-22s %8d %12.6f %12.6f %14d" % (name, total["calls"], total["seconds"], total["self_seconds"], total["evaluations"]))
+    lines.append("Total function evaluations: " + str(self.evaluations))
+    return "\n".join(lines)
+
+def _update():
+  global enabled
+  enabled = bool(_profiles or _listeners)
+
+def _stack():
+  if not hasattr(_local, "stack"):
+    _local.stack = []
+  return _local.stack
+
+"""
+ Measures everything the estimators do inside a with statement
+    Returns:
+        A context manager that gives a Profile, which keeps filling up until the with statement ends
+"""
+@contextlib.contextmanager
+def profile():
+  report = Profile()
+  _profiles.append(report)
+  _update()
+  try:
+    yield report
+  finally:
+    _profiles.remove(report)
+    _update()
+
+"""
+ Registers a function that is called every time a timed function returns
+    Args:
+        listener: A function that takes the Record of the call that just finished and its depth, 0 for calls made from outside of
+        any timed function
+"""
+def add_listener(listener):
+  _listeners.append(listener)
+  _update()
+
+"""
+ Stops calling a function registered with add_listener
+"""
+def remove_listener(listener):
+  _listeners.remove(listener)
+  _update()
+
+"""
+ Counts evaluations of the integrand, called by the code that evaluates it
+    Args:
+        evaluations: A non-negative integer, the number of points just evaluated
+"""
+def count(evaluations):
+  stack = _stack()
+  if stack:
+    stack[-1].evaluations += evaluations
+  for report in _profiles:
+    report.evaluations += evaluations
+
+"""
+ Decorator that times a function and attributes to it the evaluations made while it runs
+    Args:
+        name: The name of the function in the profiles
+    Notes:
+        When instrumentation is not enabled the decorated function only pays for checking a flag
+"""
+def timed(name):
+  def decorator(f):
+    @functools.wraps(f)
+    def wrapper(*args, **kwargs):
+      if not enabled:
+        return f(*args, **kwargs)
+
+      stack = _stack()
+      record = Record(name)
+      stack.append(record)
+      start = time.perf_counter()
+      try:
+        return f(*args, **kwargs)
+      finally:
+        record.seconds = time.perf_counter() - start
+        stack.pop()
+        if stack:
+          stack[-1].children.append(record)
+          stack[-1].evaluations += record.evaluations
+        else:
+          for report in _profiles:
+            report.calls.append(record)
+        for listener in _listeners:
+          listener(record, len(stack))
+    return wrapper
+  return decorator
@@ -1,6 +1,218 @@
-from py_expression_eval import Parser
-import random
+from cache import ResultCache
+from closed_form import closed_form
+from concurrent.futures import Executor, ProcessPoolExecutor
+from expression import normalize_expression, parse_function, sample
+import instrument
+import numpy
+import argparse
+import contextlib
+import csv
+import functools
+import heapq
 import math
+import random
+import statistics
+import sys
+import time
+
+RULES = ["left", "right", "midpoint", "trapezium", "simpson", "average"]
+RULE_COMPONENTS = {"left": ["left"], "right": ["right"], "midpoint": ["midpoint"], "trapezium": ["left", "right"], "simpson": ["left", "right", "midpoint"], "average": ["left", "right", "midpoint"]}
+CHUNK_SIZE = 10 ** 6
+BUFFER_SIZE = 2 ** 16
+TANH_SINH_RANGE = 6.5
+# Farthest point evaluated by tanh_sinh over an infinite interval, beyond it powers of x such as x^2*exp(-x) overflow
+TANH_SINH_LIMIT = 1e30
+
+"""
+ Estimates the integral of function over the interval (a, b) with several uniform rules at once, sampling the function only once
+    Args:
+        function: A py_expression expression 
+        a: A float number that represents the left bound of integration
+        b: A float number that represents the right bound of integration
+        rectangles: A positive integer that represents the number of subintervals considered in the estimation of the integral.
+        rules: A list with the names of the rules to compute, out of "left", "right", "midpoint", "trapezium", "simpson" and "average"
+        workers: An optional positive integer, when given the function is evaluated in that many worker processes, or a
+        concurrent.futures executor whose workers are reused, so a series of estimations does not start new processes every time
+        chunk_size: A positive integer that represents the number of points each worker evaluates at a time
+
+    Returns:
+        A dictionary that maps the name of every requested rule to its estimation of the integral
+    Notes:
+        Assumes the function provided is supported and continous in (a, b)
+        The function is evaluated at most once at each of the rectangles + 1 endpoints and the rectangles midpoints, and only the
+        points needed by the requested rules are evaluated. Asking for "left" alone costs rectangles evaluations, asking for all of
+        the rules costs 2 * rectangles + 1.
+        The result of a parallel estimation does not depend on the number of workers.
+"""
+@instrument.timed("estimate")
+def estimate(function, a, b, rectangles, rules=RULES, workers=None, chunk_size=CHUNK_SIZE):
+  if a == b:
+    return {rule: 0 for rule in rules}
+
+  delta_x = (b - a) / rectangles
+  if delta_x < 0:
+    return {rule: -value for rule, value in estimate(function, b, a, rectangles, rules, workers, chunk_size).items()}
+
+  if workers is None:
+    return combine_rules(function, a, delta_x, rectangles, rules, functools.partial(grid_sums, function, a, delta_x))
+  if isinstance(workers, Executor):
+    return combine_rules(function, a, delta_x, rectangles, rules, functools.partial(parallel_grid_sums, workers, function, a, delta_x, chunk_size))
+
+  with ProcessPoolExecutor(workers) as pool:
+    return combine_rules(function, a, delta_x, rectangles, rules, functools.partial(parallel_grid_sums, pool, function, a, delta_x, chunk_size))
+
+"""
+ Computes the requested uniform rules out of sums of the function over the endpoints and midpoints of the rectangles
+    Args:
+        function: A py_expression expression 
+        a: A float number that represents the left bound of integration
+        delta_x: A positive float number that represents the width of the rectangles
+        rectangles: A positive integer that represents the number of subintervals considered in the estimation of the integral.
+        rules: A list with the names of the rules to compute
+        totals: A function that takes a list of ranges of rectangles, as tuples of start, stop and an offset within them, and returns
+        the sum of the function over the points of every range
+    Returns:
+        A dictionary that maps the name of every requested rule to its estimation of the integral
+"""
+def combine_rules(function, a, delta_x, rectangles, rules, totals):
+  needs_midpoints = any(rule in ["midpoint", "simpson", "average"] for rule in rules)
+  needs_a = any(rule in ["left", "trapezium", "simpson", "average"] for rule in rules)
+  needs_b = any(rule in ["right", "trapezium", "simpson", "average"] for rule in rules)
+
+  # The interior endpoints and the midpoints are requested together, so a pool of workers evaluates both at once
+  ranges = []
+  if needs_a or needs_b:
+    ranges.append((1, rectangles, 0))
+  if needs_midpoints:
+    ranges.append((0, rectangles, 0.5))
+  sums = totals(ranges)
+
+  results = {}
+  if needs_a or needs_b:
+    interior = sums[0]
+    if needs_a:
+      results["left"] = (grid_sum(function, a, delta_x, 0, 1, 0) + interior) * delta_x
+    if needs_b:
+      results["right"] = (interior + grid_sum(function, a, delta_x, rectangles, rectangles + 1, 0)) * delta_x
+
+  if needs_midpoints:
+    results["midpoint"] = sums[-1] * delta_x
+
+  complete_rules(results)
+  return {rule: results[rule] for rule in rules}
+
+"""
+ Adds to the estimations of the left, right and midpoint rules those of the rules derived from them
+    Args:
+        results: A dictionary with some of "left", "right" and "midpoint", which gets "trapezium" when it has "left" and "right", and also
+        "simpson" and "average" when it has the three of them
+"""
+def complete_rules(results):
+  if "left" in results and "right" in results:
+    results["trapezium"] = (results["left"] + results["right"]) / 2
+    if "midpoint" in results:
+      results["simpson"] = (2 * results["midpoint"] + results["trapezium"]) / 3
+      results["average"] = (results["simpson"] + results["trapezium"] + results["left"] + results["right"] + results["midpoint"]) / 5
+
+"""
+ Running sum that keeps track of the rounding error of every addition (Neumaier's variant of Kahan summation)
+    Notes:
+        Complex values are accepted, their imaginary parts are added up in a second CompensatedSum
+"""
+class CompensatedSum:
+  def __init__(self):
+    self.total = 0.0
+    self.compensation = 0.0
+    self.imaginary = None
+
+  def add(self, value):
+    if isinstance(value, complex):
+      if self.imaginary is None:
+        self.imaginary = CompensatedSum()
+      self.imaginary.add(value.imag)
+      value = value.real
+
+    total = self.total + value
+    if math.fabs(self.total) >= math.fabs(value):
+      self.compensation += (self.total - total) + value
+    else:
+      self.compensation += (value - total) + self.total
+    self.total = total
+
+  def value(self):
+    if self.imaginary is None:
+      return self.total + self.compensation
+    return complex(self.total + self.compensation, self.imaginary.value())
+
+"""
+ Adds numbers exactly like math.fsum, also when some of them are complex
+    Args:
+        values: An iterable of float or complex numbers
+    Returns:
+        The correctly rounded sum, a complex number when some of the values are complex
+"""
+def exact_sum(values):
+  values = list(values)
+  if not any(isinstance(value, complex) for value in values):
+    return math.fsum(values)
+  return complex(math.fsum(complex(value).real for value in values), math.fsum(complex(value).imag for value in values))
+
+"""
+ Adds the values of function over a range of equally spaced points
+    Args:
+        function: A py_expression expression 
+        a: A float number that represents the left bound of integration
+        delta_x: A float number that represents the width of the rectangles
+        start: A non-negative integer, the index of the first rectangle
+        stop: A non-negative integer, the index after the last rectangle
+        offset: A float number in [0, 1) that represents where the point lies inside every rectangle, 0 for the left endpoints and 0.5 for the midpoints
+    Returns:
+        The sum of the function over the points a + (i + offset) * delta_x for i from start to stop - 1
+    Notes:
+        The points are evaluated BUFFER_SIZE at a time, so memory does not grow with the number of points. Every buffer is added with
+        NumPy's pairwise summation and the buffers are added with a CompensatedSum, so the rounding error does not grow with the
+        number of points either. Every point is computed from its own index instead of by adding delta_x repeatedly.
+"""
+def grid_sum(function, a, delta_x, start, stop, offset):
+  total = CompensatedSum()
+  for first in range(start, stop, BUFFER_SIZE):
+    indices = numpy.arange(first, min(first + BUFFER_SIZE, stop))
+    total.add(numpy.sum(sample(function, a + (indices + offset) * delta_x)).item())
+  return total.value()
+
+"""
+ Adds the values of function over several ranges of equally spaced points, see grid_sum
+    Args:
+        ranges: A list of tuples with the start, stop and offset of every range
+        function, a, delta_x: The same as in grid_sum
+    Returns:
+        A list with the sum of every range
+"""
+def grid_sums(function, a, delta_x, ranges):
+  return [grid_sum(function, a, delta_x, start, stop, offset) for start, stop, offset in ranges]
+
+"""
+ Adds the values of a function over several ranges of equally spaced points with a pool of worker processes
+    Args:
+        pool: A concurrent.futures executor, it may be shared by many estimations of different functions
+        chunk_size: A positive integer that represents the number of points every worker adds at a time
+        function, a, delta_x, ranges: The same as in grid_sums
+    Returns:
+        A list with the sum of every range
+    Notes:
+        The chunks of all the ranges are submitted at once, so the workers are never left waiting for one range to finish before
+        the next one starts. The points are split in chunks that only depend on chunk_size, and the partial sums of every range are
+        combined in the order of its chunks with exact_sum, so the result is exactly the same whatever the number of workers.
+"""
+def parallel_grid_sums(pool, function, a, delta_x, chunk_size, ranges):
+  chunks = [(index, first, min(first + chunk_size, stop), offset) for index, (start, stop, offset) in enumerate(ranges) for first in range(start, stop, chunk_size)]
+  futures = [pool.submit(grid_sum, function, a, delta_x, first, stop, offset) for _, first, stop, offset in chunks]
+  partials = [[] for _ in ranges]
+  for (index, _, _, _), future in zip(chunks, futures):
+    partials[index].append(future.result())
+  if instrument.enabled:
+    instrument.count(sum(max(0, stop - start) for start, stop, _ in ranges))
+  return [exact_sum(values) for values in partials]
 
 """
  Estimates the integral of function over the interval (a, b) using an specified number of rectangles and Simpson's Method
@@ -17,15 +229,9 @@ import math
         Assumes the function provided is supported and continous in (a, b)
         Simpson's method will return the weighted average that corresponds to simpson's method when rectangles is odd (simpson's method is usually defined for an even number rectangles by the way it is derived)
 """
+@instrument.timed("simpson")
 def simpson(function, a, b, rectangles):
-
-  if a == b:
-    return 0
-
-  delta_x = (b - a) / rectangles
-  if delta_x < 0:
-    return -simpson(function, b, a, rectangles)
-  return (2 * midpoint(function, a, b, rectangles) + trapezium(function, a, b, rectangles)) / 3
+  return estimate(function, a, b, rectangles, ["simpson"])["simpson"]
 
 """
  Estimates the integral of function over the interval (a, b) using an specified number of rectangles and Left Riemann Sums
@@ -40,22 +246,9 @@ def simpson(function, a, b, rectangles):
     Notes:
         Assumes the function provided is supported and continous in (a, b)
 """
+@instrument.timed("left")
 def left(function, a, b, rectangles):
-
-  if a == b:
-    return 0
-
-  delta_x = (b - a) / rectangles
-
-  if delta_x < 0:
-    return -left(function, b, a, rectangles)
-
-  total = 0
-  for i in range(0, rectangles):
-    total += function.evaluate({'x' : a + i * delta_x})
-  total *= delta_x
-
-  return total
+  return estimate(function, a, b, rectangles, ["left"])["left"]
 
 """
  Estimates the integral of function over the interval (a, b) using an specified number of rectangles and Right Riemann Sums
@@ -70,15 +263,9 @@ def left(function, a, b, rectangles):
     Notes:
         Assumes the function provided is supported and continous in (a, b)
 """
+@instrument.timed("right")
 def right(function, a, b, rectangles):
-  if a == b:
-    return 0
-  delta_x = (b - a) / rectangles
-
-  if delta_x < 0:
-    return -right(function, b, a, rectangles)
-
-  return left(function, a + delta_x, b + delta_x, rectangles)
+  return estimate(function, a, b, rectangles, ["right"])["right"]
 
 """
  Estimates the integral of function over the interval (a, b) using an specified number of rectangles and the midpoint rule
@@ -93,14 +280,9 @@ def right(function, a, b, rectangles):
     Notes:
         Assumes the function provided is supported and continous in (a, b)
 """
+@instrument.timed("midpoint")
 def midpoint(function, a, b, rectangles):
-  if a == b:
-    return 0
-  
-  delta_x = (b - a) / rectangles
-  if delta_x < 0:
-    return -midpoint(function, b, a, rectangles)
-  return left(function, a + (delta_x / 2), b + (delta_x) / 2, rectangles)
+  return estimate(function, a, b, rectangles, ["midpoint"])["midpoint"]
 
 """
  Estimates the integral of function over the interval (a, b) using an specified number of rectangles and the trapezium rule
@@ -115,14 +297,9 @@ def midpoint(function, a, b, rectangles):
     Notes:
         Assumes the function provided is supported and continous in (a, b)
 """
+@instrument.timed("trapezium")
 def trapezium(function, a, b, rectangles):
-  if a == b:
-    return 0
-  
-  delta_x = (b - a) / rectangles
-  if delta_x < 0:
-    return -trapezium(function, b, a, rectangles)
-  return (left(function, a, b, rectangles) + right(function, a, b, rectangles)) / 2
+  return estimate(function, a, b, rectangles, ["trapezium"])["trapezium"]
 
 """
  Estimates the integral of function over the interval (a, b) using an specified number of rectangles and left riemann sums, right riemann sums, trapezium rule, simpson's rule and midpoint rule by taking their average
@@ -137,11 +314,10 @@ def trapezium(function, a, b, rectangles):
     Notes:
         Assumes the function provided is supported and continous in (a, b)
 """
+@instrument.timed("average")
 def average(function, a, b, rectangles):
-  if a == b:
-    return 0
-  return (simpson(function, a, b, rectangles) + trapezium(function, a, b, rectangles) + left(function, a, b, rectangles) + right(function, a, b, rectangles) + midpoint(function, a, b, rectangles)) / 5
-  
+  return estimate(function, a, b, rectangles, ["average"])["average"]
+
 """
  Estimates the integral of function over the interval (a, b) using a tolerance number and the left and right riemann sums
     Args:
@@ -155,12 +331,13 @@ def average(function, a, b, rectangles):
         Assumes the function provided is supported, continous and of monotone behaviour in (lower_bound, higher_bound)
         The algorithm works fine for any function but the tolerance being guaranteed by a theorem requires the function be monotone
 """
+@instrument.timed("left_right_tolerance")
 def left_right_tolerance(function, lower_bound, higher_bound, initial,epsilon):
   if lower_bound == higher_bound:
     return 0
   rectangles = initial
-  right_appr = right(function, lower_bound, higher_bound, rectangles)
-  left_appr = left(function, lower_bound, higher_bound, rectangles)
+  appr = estimate(function, lower_bound, higher_bound, rectangles, ["left", "right"])
+  left_appr, right_appr = appr["left"], appr["right"]
 
   while math.fabs(right_appr - left_appr) > epsilon:
     print("\nRectangles:", rectangles)
@@ -188,12 +365,705 @@ def left_right_tolerance(function, lower_bound, higher_bound, initial,epsilon):
         print("\nYour input should be either 'q' or a positive integer. Try again. ")
         continue
 
-    right_appr = right(function, lower_bound, higher_bound, rectangles)
-    left_appr = left(function, lower_bound, higher_bound, rectangles)
+    appr = estimate(function, lower_bound, higher_bound, rectangles, ["left", "right"])
+    left_appr, right_appr = appr["left"], appr["right"]
     print()
 
   return (right_appr + left_appr) / 2
 
+"""
+ Estimates the integral of function over the interval (a, b) using a tolerance number and the left and right riemann sums, doubling the number of rectangles until the tolerance is met without asking the user
+    Args:
+        function: A py_expression expression 
+        lower_bound: A float number that represents the left bound of integration
+        higher_bound: A float number that represents the right bound of integration
+        initial: A positive integer that represents the number of rectangles to start with
+        epsilon: A float small positive number that represents the maximum desired difference between the left and right riemann sums
+        max_evaluations: An optional positive integer that limits the number of times the function is evaluated
+        max_seconds: An optional positive float number that limits the time spent refining
+    Returns:
+        A tuple with the estimation of the integral (the average of the left and right riemann sums), the difference between the left and right riemann sums that was achieved and the number of times the function was evaluated
+    Notes:
+        Assumes the function provided is supported, continous and of monotone behaviour in (lower_bound, higher_bound)
+        Every refinement halves the rectangles, so the endpoints of the previous grid are reused and only the new midpoints are evaluated
+        Stops before refining further when doing so would exceed max_evaluations, in which case the difference returned is larger than epsilon
+"""
+@instrument.timed("left_right_refine")
+def left_right_refine(function, lower_bound, higher_bound, initial, epsilon, max_evaluations=None, max_seconds=None):
+  if lower_bound == higher_bound:
+    return 0, 0, 0
+  if higher_bound < lower_bound:
+    appr, error, evaluations = left_right_refine(function, higher_bound, lower_bound, initial, epsilon, max_evaluations, max_seconds)
+    return -appr, error, evaluations
+
+  start = time.perf_counter()
+  rectangles = initial
+  delta_x = (higher_bound - lower_bound) / rectangles
+  first = grid_sum(function, lower_bound, delta_x, 0, 1, 0)
+  last = grid_sum(function, lower_bound, delta_x, rectangles, rectangles + 1, 0)
+  interior = CompensatedSum()
+  interior.add(grid_sum(function, lower_bound, delta_x, 1, rectangles, 0))
+  evaluations = rectangles + 1
+
+  while True:
+    left_appr = (first + interior.value()) * delta_x
+    right_appr = (interior.value() + last) * delta_x
+    error = math.fabs(right_appr - left_appr)
+
+    if error <= epsilon:
+      break
+    if max_evaluations is not None and evaluations + rectangles > max_evaluations:
+      break
+    if max_seconds is not None and time.perf_counter() - start >= max_seconds:
+      break
+
+    interior.add(grid_sum(function, lower_bound, delta_x, 0, rectangles, 0.5))
+    evaluations += rectangles
+    rectangles *= 2
+    delta_x /= 2
+
+  return (right_appr + left_appr) / 2, error, evaluations
+
+KRONROD_NODES = numpy.array([0.991455371120812639206854697526329, 0.949107912342758524526189684047851, 0.864864423359769072789712788640926, 0.741531185599394439863864773280788, 0.586087235467691130294144845693013, 0.405845151377397166906606412076961, 0.207784955007898467600689403773245, 0.0])
+KRONROD_WEIGHTS = numpy.array([0.022935322010529224963732008058970, 0.063092092629978553290700663189204, 0.104790010322250183839876322541518, 0.140653259715525918745189590510238, 0.169004726639267902826583426598550, 0.190350578064785409913256402421014, 0.204432940075298892414161999234649, 0.209482141084727828012999174891714])
+GAUSS_WEIGHTS = numpy.array([0.129484966168869693270611432679082, 0.279705391489276667901467771423780, 0.381830050505118944950369775488975, 0.417959183673469387755102040816327])
+
+# The 15 Kronrod nodes in (-1, 1) and their weights, the 7 Gauss nodes are the odd positions of KRONROD_NODES
+GK15_NODES = numpy.concatenate([-KRONROD_NODES[:-1], KRONROD_NODES[::-1]])
+GK15_WEIGHTS = numpy.concatenate([KRONROD_WEIGHTS[:-1], KRONROD_WEIGHTS[::-1]])
+G7_WEIGHTS = numpy.zeros(15)
+G7_WEIGHTS[1:7:2] = GAUSS_WEIGHTS[:3]
+G7_WEIGHTS[7] = GAUSS_WEIGHTS[3]
+G7_WEIGHTS[9:15:2] = GAUSS_WEIGHTS[2::-1]
+
+"""
+ Estimates the integral of function over the interval (a, b) with the 7 point Gauss and 15 point Kronrod rules
+    Args:
+        function: A py_expression expression 
+        a: A float number that represents the left bound of integration
+        b: A float number that represents the right bound of integration
+
+    Returns:
+        The Kronrod estimation of the integral and the difference between the Kronrod and Gauss estimations as its error
+"""
+def gauss_kronrod(function, a, b):
+  half = (b - a) / 2
+  values = sample(function, (a + b) / 2 + half * GK15_NODES)
+  kronrod = half * numpy.dot(GK15_WEIGHTS, values)
+  gauss = half * numpy.dot(G7_WEIGHTS, values)
+  return kronrod, math.fabs(kronrod - gauss)
+
+"""
+ Estimates the integral of function over the interval (a, b) by splitting the subinterval with the largest error until the estimated error meets the tolerance
+    Args:
+        function: A py_expression expression 
+        a: A float number that represents the left bound of integration
+        b: A float number that represents the right bound of integration
+        epsilon: A float small positive number that represents the maximum desired absolute error
+        relative_epsilon: A float small non-negative number that represents the maximum desired error relative to the size of the integral
+        max_evaluations: A positive integer that limits the number of times the function is evaluated
+
+    Returns:
+        A tuple with the estimation of the integral, its estimated error and the number of times the function was evaluated
+    Notes:
+        Assumes the function provided is supported in (a, b). Unlike the uniform rules, isolated sharp features such as kinks get
+        many small subintervals while the smooth stretches are covered by a few large ones.
+        Stops as soon as the error is below either epsilon or relative_epsilon times the estimation, or when one more split would
+        exceed max_evaluations, in which case the error returned is larger than requested.
+"""
+@instrument.timed("adaptive")
+def adaptive(function, a, b, epsilon, relative_epsilon=0, max_evaluations=100000):
+  if a == b:
+    return 0, 0, 0
+
+  appr, error = gauss_kronrod(function, a, b)
+  evaluations = 15
+  # Max-heap on the error of every subinterval
+  heap = [(-error, a, b, appr)]
+  # Running totals of the heap, updated with every split instead of adding up the whole heap again
+  total = CompensatedSum()
+  total.add(appr)
+  total_error = CompensatedSum()
+  total_error.add(error)
+
+  while error > max(epsilon, relative_epsilon * math.fabs(appr)) and evaluations + 30 <= max_evaluations:
+    piece_error, low, high, piece = heapq.heappop(heap)
+    middle = (low + high) / 2
+    if middle == low or middle == high:
+      heapq.heappush(heap, (piece_error, low, high, piece))
+      break
+
+    left_appr, left_error = gauss_kronrod(function, low, middle)
+    right_appr, right_error = gauss_kronrod(function, middle, high)
+    evaluations += 30
+    heapq.heappush(heap, (-left_error, low, middle, left_appr))
+    heapq.heappush(heap, (-right_error, middle, high, right_appr))
+
+    total.add(left_appr + right_appr - piece)
+    total_error.add(left_error + right_error + piece_error)
+    appr = total.value()
+    error = total_error.value()
+
+  return math.fsum(item[3] for item in heap), math.fsum(-item[0] for item in heap), evaluations
+
+"""
+ Computes the nodes and weights of the Gauss-Legendre rule of a given order in the interval (-1, 1)
+    Args:
+        order: A positive integer that represents the number of nodes
+    Returns:
+        Two read-only NumPy arrays with the nodes and their weights
+    Notes:
+        The results are cached, so repeated integrations with the same order do not pay for the setup again
+"""
+@functools.lru_cache(maxsize=32)
+def legendre_nodes(order):
+  nodes, weights = numpy.polynomial.legendre.leggauss(order)
+  nodes.flags.writeable = False
+  weights.flags.writeable = False
+  return nodes, weights
+
+"""
+ Estimates the integral of function over the interval (a, b) using an specified number of rectangles and the Gauss-Legendre rule in each of them
+    Args:
+        function: A py_expression expression 
+        a: A float number that represents the left bound of integration
+        b: A float number that represents the right bound of integration
+        rectangles: A positive integer that represents the number of subintervals considered in the estimation of the integral.
+        order: A positive integer that represents the number of nodes used in each subinterval
+
+    Returns:
+        The estimation of the integral
+    Notes:
+        Assumes the function provided is supported and continous in (a, b)
+        The rule of a given order is exact for polynomials of degree up to 2 * order - 1, so smooth functions need very few rectangles
+"""
+@instrument.timed("gauss_legendre")
+def gauss_legendre(function, a, b, rectangles, order=20):
+  if a == b:
+    return 0
+
+  delta_x = (b - a) / rectangles
+  nodes, weights = legendre_nodes(order)
+  offsets = (nodes + 1) * (delta_x / 2)
+  block = max(1, BUFFER_SIZE // order)
+
+  total = CompensatedSum()
+  for first in range(0, rectangles, block):
+    count = min(block, rectangles - first)
+    points = (a + numpy.arange(first, first + count) * delta_x)[:, numpy.newaxis] + offsets
+    values = sample(function, points.ravel()).reshape(count, order)
+    total.add(numpy.sum(values @ weights).item())
+  return total.value() * (delta_x / 2)
+
+"""
+ Computes the nodes and weights that reproduce one of the rules as a weighted sum of the function
+    Args:
+        a: A float number that represents the left bound of integration
+        b: A float number that represents the right bound of integration, larger than a
+        rectangles: A positive integer that represents the number of subintervals considered in the estimation of the integral.
+        method: One of the names in RULES or "gauss_legendre"
+        order: A positive integer, the number of nodes in every rectangle for "gauss_legendre"
+    Returns:
+        Two NumPy arrays with the nodes and their weights, the rule estimates the integral of a function f as the sum of f(nodes) * weights
+"""
+def quadrature(a, b, rectangles, method, order=20):
+  delta_x = (b - a) / rectangles
+  indices = numpy.arange(rectangles)
+
+  if method == "gauss_legendre":
+    nodes, weights = legendre_nodes(order)
+    points = (a + indices * delta_x)[:, numpy.newaxis] + (nodes + 1) * (delta_x / 2)
+    return points.ravel(), numpy.tile(weights * (delta_x / 2), rectangles)
+
+  # Endpoints first, then midpoints, weighted so that every rule matches combine_rules
+  endpoints = a + numpy.arange(rectangles + 1) * delta_x
+  midpoints = a + (indices + 0.5) * delta_x
+  left_weights = numpy.append(numpy.full(rectangles, delta_x), 0)
+  right_weights = numpy.insert(numpy.full(rectangles, delta_x), 0, 0)
+  zeros = numpy.zeros(rectangles + 1)
+  components = {
+    "left": numpy.concatenate([left_weights, numpy.zeros(rectangles)]),
+    "right": numpy.concatenate([right_weights, numpy.zeros(rectangles)]),
+    "midpoint": numpy.concatenate([zeros, numpy.full(rectangles, delta_x)]),
+  }
+  components["trapezium"] = (components["left"] + components["right"]) / 2
+  components["simpson"] = (2 * components["midpoint"] + components["trapezium"]) / 3
+  components["average"] = (components["simpson"] + components["trapezium"] + components["left"] + components["right"] + components["midpoint"]) / 5
+
+  weights = components[method]
+  nodes = numpy.concatenate([endpoints, midpoints])
+  used = weights != 0
+  return nodes[used], weights[used]
+
+"""
+ Estimates the integral of a family of functions over the interval (a, b), one for every set of values of its parameters
+    Args:
+        text: A string with an expression of 'x' and the parameters, as typed by the user
+        parameters: A dictionary that maps the name of every parameter to a list or NumPy array with its values, all of the same length
+        a: A float number that represents the left bound of integration
+        b: A float number that represents the right bound of integration
+        rectangles: A positive integer that represents the number of subintervals considered in the estimation of the integral.
+        method: One of the names in RULES or "gauss_legendre"
+    Returns:
+        A NumPy array with the estimation of the integral for every set of parameters, in the order they were given
+    Notes:
+        The nodes and weights of the rule are computed once for the whole sweep. The function is evaluated over blocks of the grid of
+        nodes by sets of parameters with single array calls, keeping about BUFFER_SIZE * 16 values in memory at a time.
+        The names of the parameters go through the same normalization as the expression, so they should avoid the letter e and
+        the names of the supported functions
+"""
+@instrument.timed("sweep")
+def sweep(text, parameters, a, b, rectangles, method="simpson"):
+  function = parse_function(text)
+  names = {normalize_expression(name): numpy.asarray(values, dtype=float) for name, values in parameters.items()}
+  unknown = [variable for variable in function.variables() if variable != 'x' and variable not in names]
+  if unknown:
+    raise ValueError("The expression has variables that are not parameters: " + ", ".join(unknown))
+  count = len(next(iter(names.values()))) if names else 1
+  if any(len(values) != count for values in names.values()):
+    raise ValueError("Every parameter should have the same number of values")
+
+  if a == b:
+    return numpy.zeros(count)
+  if b < a:
+    return -sweep(text, parameters, b, a, rectangles, method)
+
+  nodes, weights = quadrature(a, b, rectangles, method)
+  node_block = min(len(nodes), BUFFER_SIZE)
+  parameter_block = max(1, BUFFER_SIZE * 16 // node_block)
+
+  results = numpy.zeros(count)
+  for first in range(0, count, parameter_block):
+    block = {name: values[first:first + parameter_block, numpy.newaxis] for name, values in names.items()}
+    for start in range(0, len(nodes), node_block):
+      values = sample(function, nodes[start:start + node_block], block)
+      results[first:first + parameter_block] += values.reshape(-1, min(node_block, len(nodes) - start)) @ weights[start:start + node_block]
+  return results
+
+"""
+ Integrates function from a up to every endpoint of the rectangles, a block of endpoints at a time
+    Args:
+        function: A py_expression expression 
+        a: A float number that represents the left bound of integration
+        b: A float number that represents the right bound of integration
+        rectangles: A positive integer that represents the number of subintervals considered in the estimation of the integral.
+        method: One of the names in RULES, the rule applied to every rectangle
+    Returns:
+        A generator of tuples with a NumPy array of consecutive endpoints, the integral from a to each of them and the value of the
+        function at each of them, or None for the rules that do not evaluate the function at the endpoints
+    Notes:
+        The function is sampled once, BUFFER_SIZE rectangles at a time. The running integral is a prefix sum of the estimations of
+        every rectangle, carried from one block to the next with a CompensatedSum.
+"""
+def cumulative_blocks(function, a, b, rectangles, method="trapezium"):
+  delta_x = (b - a) / rectangles
+  needs_endpoints = method != "midpoint"
+  needs_midpoints = method in ["midpoint", "simpson", "average"]
+  running = CompensatedSum()
+
+  yield numpy.array([a]), numpy.zeros(1), sample(function, numpy.array([a])) if needs_endpoints else None
+
+  for first in range(0, rectangles, BUFFER_SIZE):
+    indices = numpy.arange(first, min(first + BUFFER_SIZE, rectangles))
+    endpoints = a + numpy.append(indices, indices[-1] + 1) * delta_x
+    ends = sample(function, endpoints) if needs_endpoints else None
+    middles = sample(function, a + (indices + 0.5) * delta_x) if needs_midpoints else None
+
+    pieces = {}
+    if needs_endpoints:
+      pieces["left"] = ends[:-1] * delta_x
+      pieces["right"] = ends[1:] * delta_x
+    if needs_midpoints:
+      pieces["midpoint"] = middles * delta_x
+    complete_rules(pieces)
+
+    partial = numpy.cumsum(pieces[method])
+    values = running.value() + partial
+    running.add(partial[-1].item())
+    yield endpoints[1:], values, ends[1:] if needs_endpoints else None
+
+"""
+ Table of the integral of a function from a fixed point up to many points, which answers further integrals without evaluating the function
+"""
+class AntiderivativeTable:
+  def __init__(self, nodes, values, slopes=None):
+    if len(nodes) > 1 and nodes[-1] < nodes[0]:
+      nodes, values = nodes[::-1], values[::-1]
+      slopes = slopes[::-1] if slopes is not None else None
+    self.nodes = nodes
+    self.values = values
+    self.slopes = slopes
+
+  """
+   Looks up the integral from the lower bound of the table up to t
+      Args:
+          t: A float number or a NumPy array of them, inside the interval covered by the table
+      Returns:
+          The interpolated integral, a float number or a NumPy array like t
+      Notes:
+          When the table knows the function at its nodes the interpolation is cubic (Hermite), as the function is the derivative of
+          its integral, otherwise it is linear. Raises ValueError outside of the interval of the table.
+  """
+  def __call__(self, t):
+    t = numpy.asarray(t, dtype=float)
+    if numpy.any(t < self.nodes[0]) or numpy.any(t > self.nodes[-1]):
+      raise ValueError("The table only covers the interval from " + str(self.nodes[0]) + " to " + str(self.nodes[-1]))
+    if self.slopes is None or len(self.nodes) < 2:
+      return numpy.interp(t, self.nodes, self.values)[()]
+
+    i = numpy.clip(numpy.searchsorted(self.nodes, t, side="right") - 1, 0, len(self.nodes) - 2)
+    width = self.nodes[i + 1] - self.nodes[i]
+    s = (t - self.nodes[i]) / width
+    h00 = (1 + 2 * s) * (1 - s) ** 2
+    h10 = s * (1 - s) ** 2
+    h01 = s ** 2 * (3 - 2 * s)
+    h11 = s ** 2 * (s - 1)
+    result = h00 * self.values[i] + h10 * width * self.slopes[i] + h01 * self.values[i + 1] + h11 * width * self.slopes[i + 1]
+    return result[()]
+
+"""
+ Estimates the integral of function from a up to every endpoint of the rectangles in one pass
+    Args:
+        function: A py_expression expression 
+        a: A float number that represents the left bound of integration
+        b: A float number that represents the right bound of integration
+        rectangles: A positive integer that represents the number of subintervals considered in the estimation of the integral.
+        method: One of the names in RULES, the rule applied to every rectangle
+    Returns:
+        An AntiderivativeTable with the rectangles + 1 endpoints and the integral from a to each of them
+    Notes:
+        Costs the same evaluations as a single estimation with the same rule, instead of one estimation per endpoint
+"""
+@instrument.timed("cumulative")
+def cumulative(function, a, b, rectangles, method="trapezium"):
+  blocks = list(cumulative_blocks(function, a, b, rectangles, method))
+  nodes = numpy.concatenate([block[0] for block in blocks])
+  values = numpy.concatenate([block[1] for block in blocks])
+  slopes = numpy.concatenate([block[2] for block in blocks]) if blocks[0][2] is not None else None
+  return AntiderivativeTable(nodes, values, slopes)
+
+"""
+ Writes the integral of function from a up to every endpoint of the rectangles to a CSV file, without keeping the table in memory
+    Args:
+        stream: An open text file
+        function, a, b, rectangles, method: The same as in cumulative
+"""
+def write_cumulative(stream, function, a, b, rectangles, method="trapezium"):
+  writer = csv.writer(stream)
+  writer.writerow(["x", "integral"])
+  for nodes, values, _ in cumulative_blocks(function, a, b, rectangles, method):
+    writer.writerows(zip(nodes.tolist(), values.tolist()))
+
+"""
+ Estimates the integral of function over the interval (a, b) with Romberg's method, extrapolating trapezium rule estimations on grids with half the width each time
+    Args:
+        function: A py_expression expression 
+        a: A float number that represents the left bound of integration
+        b: A float number that represents the right bound of integration
+        initial: A positive integer that represents the number of rectangles of the coarsest trapezium rule
+        epsilon: A float small positive number that represents the maximum desired difference between two consecutive diagonal entries of the tableau
+        max_levels: A positive integer that limits the number of times the rectangles are halved
+
+    Returns:
+        A tuple with the estimation of the integral and the Richardson tableau as a list of rows, where row k holds the extrapolations of the trapezium rule with initial * 2^k rectangles
+    Notes:
+        Assumes the function provided is smooth in (a, b), otherwise extrapolating does not improve the trapezium rule
+        The trapezium rule on the halved grid is the average of the current trapezium and midpoint rules, so every level reuses all the previous samples and only evaluates the new midpoints
+"""
+@instrument.timed("romberg")
+def romberg(function, a, b, initial, epsilon, max_levels=20):
+  if a == b:
+    return 0, [[0]]
+
+  rectangles = initial
+  tableau = [[trapezium(function, a, b, rectangles)]]
+
+  for level in range(1, max_levels + 1):
+    row = [(tableau[-1][0] + midpoint(function, a, b, rectangles)) / 2]
+    rectangles *= 2
+    for j in range(1, level + 1):
+      row.append(row[j - 1] + (row[j - 1] - tableau[-1][j - 1]) / (4 ** j - 1))
+    tableau.append(row)
+
+    if math.fabs(row[-1] - tableau[-2][-1]) <= epsilon:
+      break
+
+  return tableau[-1][-1], tableau
+
+"""
+ Computes the nodes and weights of one level of the tanh-sinh rule in the interval (-1, 1)
+    Args:
+        level: A non-negative integer, the step between the nodes is 2^-level
+    Returns:
+        Two read-only NumPy arrays with the distance from every new node to the closest end of the interval and its weight, for the
+        nodes at positive steps that the previous levels do not have. Every node has a mirror node with the same weight at the
+        other end of the interval, except for the center, which is the first node of level 0
+    Notes:
+        The nodes are tanh(pi/2 sinh(t)); they crowd so quickly towards the ends that their distance to them is kept instead of the
+        nodes themselves, which would round to -1 and 1. The results are cached, so every level is only computed once.
+"""
+@functools.lru_cache(maxsize=32)
+def tanh_sinh_nodes(level):
+  step = 2.0 ** -level
+  if level == 0:
+    t = numpy.arange(0, TANH_SINH_RANGE, step)
+  else:
+    t = numpy.arange(step, TANH_SINH_RANGE, 2 * step)
+
+  u = numpy.pi / 2 * numpy.sinh(t)
+  decay = numpy.exp(-2 * u)
+  distances = 2 * decay / (1 + decay)
+  weights = numpy.pi / 2 * numpy.cosh(t) * 4 * decay / (1 + decay) ** 2
+  kept = distances > 0
+  distances, weights = distances[kept], weights[kept]
+  distances.flags.writeable = False
+  weights.flags.writeable = False
+  return distances, weights
+
+"""
+ Adds up the function at one level of tanh-sinh nodes, once they are mapped from (-1, 1) to (a, b)
+    Args:
+        function: A py_expression expression 
+        a: A float number or -inf, the left bound of integration
+        b: A float number or inf, the right bound of integration, larger than a
+        level: A non-negative integer, the level of the nodes
+    Returns:
+        The sum of the function times the weight of every node of the level, the number of nodes evaluated and an estimation of
+        the integral between each bound and the node closest to it, which no level reaches
+    Notes:
+        A node s of (-1, 1) is described by 1 + s and 1 - s, one of which is a distance returned by tanh_sinh_nodes. The interval
+        (a, inf) is reached with x = a + (1 + s) / (1 - s), (-inf, b) with x = b - (1 - s) / (1 + s) and (-inf, inf) with
+        x = s / (1 - s^2). Nodes so close to a bound that they round to it, or farther than TANH_SINH_LIMIT from 0, are left out; the
+        integral beyond TANH_SINH_LIMIT is negligible for functions that decay at least like 1/x^2. The integral left out at
+        each end is estimated by end_integral.
+"""
+def tanh_sinh_sum(function, a, b, level):
+  distances, weights = tanh_sinh_nodes(level)
+  far = 2 - distances
+  plus = numpy.concatenate([far, distances])
+  minus = numpy.concatenate([distances, far])
+  weights = numpy.concatenate([weights, weights])
+  if level == 0:
+    plus, minus, weights = plus[1:], minus[1:], weights[1:]
+
+  with numpy.errstate(over="ignore", divide="ignore"):
+    if math.isinf(a) and math.isinf(b):
+      s = (plus - minus) / 2
+      points = s / (plus * minus)
+      weights = weights * (1 + s * s) / (plus * minus) ** 2
+    elif math.isinf(b):
+      points = a + plus / minus
+      weights = weights * 2 / minus ** 2
+    elif math.isinf(a):
+      points = b - minus / plus
+      weights = weights * 2 / plus ** 2
+    else:
+      half = (b - a) / 2
+      points = numpy.where(plus < minus, a + half * plus, b - half * minus)
+      weights = weights * half
+
+  kept = (numpy.abs(points) <= TANH_SINH_LIMIT) & numpy.isfinite(weights) & (points != a) & (points != b) & (weights > 0)
+  points, weights = points[kept], weights[kept]
+  if len(points) == 0:
+    return 0.0, 0, 0.0
+
+  values = sample(function, points)
+  if len(points) < 4:
+    return numpy.dot(values, weights).item(), len(points), 0.0
+
+  order = numpy.argsort(points)
+  left_out = end_integral(abs(values[order[0]]), points[order[0]], abs(values[order[1]]), points[order[1]], a)
+  left_out += end_integral(abs(values[order[-1]]), points[order[-1]], abs(values[order[-2]]), points[order[-2]], b)
+  return numpy.dot(values, weights).item(), len(points), left_out
+
+"""
+ Estimates the integral of a function between a bound and the node closest to it, from the two nodes closest to the bound
+    Args:
+        outer: The absolute value of the function at the node closest to the bound
+        outer_point: The node closest to the bound
+        inner: The absolute value of the function at the next node
+        inner_point: The next node
+        bound: A float number, -inf or inf
+    Returns:
+        A non-negative float number, inf when the function seems to grow too fast for its integral to be finite
+    Notes:
+        The function is taken to behave like a power of the distance to a finite bound, or of x for an infinite one, with the
+        exponent that matches both nodes
+"""
+def end_integral(outer, outer_point, inner, inner_point, bound):
+  if outer == 0:
+    return 0.0
+  if math.isfinite(bound):
+    distance, next_distance = abs(outer_point - bound), abs(inner_point - bound)
+    if inner == 0 or outer <= inner:
+      return float(outer * distance)
+    # The function grows like distance^-alpha towards the bound
+    alpha = math.log(outer / inner) / math.log(next_distance / distance)
+    return float(outer * distance / (1 - alpha)) if alpha < 1 else math.inf
+
+  distance, next_distance = abs(outer_point), abs(inner_point)
+  if inner == 0 or outer >= inner:
+    return math.inf
+  # The function decays like x^-beta towards infinity
+  beta = math.log(inner / outer) / math.log(distance / next_distance)
+  return float(outer * distance / (beta - 1)) if beta > 1 else math.inf
+
+"""
+ Estimates the integral of function over the interval (a, b) with the tanh-sinh (double exponential) rule, halving the step until
+ the tolerance is met
+    Args:
+        function: A py_expression expression 
+        a: A float number that represents the left bound of integration, it may be -inf
+        b: A float number that represents the right bound of integration, it may be inf
+        epsilon: A float small positive number that represents the desired error
+        max_level: A positive integer, the largest level of nodes used
+    Returns:
+        The estimation of the integral, an estimation of its error and the number of function evaluations
+    Notes:
+        The nodes crowd towards the ends of the interval double exponentially, so the function may be infinite at the bounds, such as
+        1/sqrt(x) at 0, as long as the integral is finite, and infinite bounds are mapped to a finite interval. Every level adds the
+        nodes halfway between those of the previous ones, whose sums are kept, so no point is evaluated twice.
+        The error is the larger of the difference between the last two levels and the integral left out next to the bounds. The
+        points near a bound are computed exactly, but the function only sees them rounded, so an infinity at a bound other than 0
+        leaves out a part of the integral that no level can reach, such as about 1e-8 for 1/sqrt(1-x) near 1. Once the difference
+        between levels stops shrinking, which is when rounding has taken over, the refinement stops and that plateau is reported.
+"""
+@instrument.timed("tanh_sinh")
+def tanh_sinh(function, a, b, epsilon, max_level=12):
+  if a == b:
+    return 0, 0, 0
+  if a > b:
+    result, error, evaluations = tanh_sinh(function, b, a, epsilon, max_level)
+    return -result, error, evaluations
+
+  total, evaluations, left_out = tanh_sinh_sum(function, a, b, 0)
+  result = total
+  error = math.inf
+  difference = math.inf
+  for level in range(1, max_level + 1):
+    partial, count, left_out = tanh_sinh_sum(function, a, b, level)
+    total += partial
+    evaluations += count
+    previous, result = result, total * 2.0 ** -level
+    last_difference, difference = difference, abs(result - previous)
+    error = max(difference, left_out)
+    if error <= epsilon:
+      break
+    # Every level should at least halve the difference, far more for a well behaved function
+    if level >= 4 and difference > last_difference / 2:
+      error = max(difference, last_difference, left_out)
+      break
+  return result, error, evaluations
+
+"""
+ Reverses the 32 lowest bits of every integer, which gives the base 2 radical inverse (van der Corput sequence) scaled by 2^32
+    Args:
+        indices: A NumPy array of non-negative integers
+    Returns:
+        A NumPy array of unsigned 64 bit integers
+"""
+def reverse_bits(indices):
+  indices = indices.astype(numpy.uint64)
+  reversed_bits = numpy.zeros_like(indices)
+  for _ in range(32):
+    reversed_bits = (reversed_bits << numpy.uint64(1)) | (indices & numpy.uint64(1))
+    indices = indices >> numpy.uint64(1)
+  return reversed_bits
+
+"""
+ Draws points of a sequence in [0, 1) for every randomization of a Monte Carlo estimation
+    Args:
+        sequence: "random", "halton" or "sobol"
+        start: A non-negative integer, the index of the first point of the sequence
+        count: A positive integer, the number of points
+        shifts: A NumPy array with one random shift per randomization, floats in [0, 1) for "halton", 32 bit integers for "sobol"
+        generator: A numpy.random.Generator, used by "random"
+    Returns:
+        A NumPy array with one row of count points per randomization
+    Notes:
+        In one dimension the Halton sequence is the van der Corput sequence, randomized here by a random rotation of [0, 1). The Sobol
+        sequence is the van der Corput sequence in Gray code order, randomized here by a random digital shift.
+"""
+def draw_points(sequence, start, count, shifts, generator):
+  if sequence == "random":
+    return generator.random((len(shifts), count))
+
+  indices = numpy.arange(start, start + count, dtype=numpy.uint64)
+  if sequence == "halton":
+    return (reverse_bits(indices) / 2.0 ** 32 + shifts[:, numpy.newaxis]) % 1
+
+  gray = indices ^ (indices >> numpy.uint64(1))
+  return (reverse_bits(gray) ^ shifts[:, numpy.newaxis]) / 2.0 ** 32
+
+"""
+ Estimates the integral of function over the interval (a, b) by averaging the function at random or quasi-random points until the confidence interval is narrow enough
+    Args:
+        function: A py_expression expression 
+        a: A float number that represents the left bound of integration
+        b: A float number that represents the right bound of integration
+        width: A float small positive number that represents the desired width of the confidence interval
+        sequence: "random" for plain Monte Carlo, "halton" or "sobol" for randomized quasi-Monte Carlo
+        confidence: A float number between 0 and 1, the confidence level of the interval
+        seed: An optional integer that makes the estimation reproducible
+        batch: A positive integer, the number of points drawn at a time for every randomization
+        max_samples: A positive integer that limits the number of times the function is evaluated
+        randomizations: An integer of at least 2, the number of independently randomized quasi-random sequences, ignored by "random"
+
+    Returns:
+        A tuple with the estimation of the integral, its standard error and the number of times the function was evaluated
+    Notes:
+        Only running sums are kept, never the samples. Plain Monte Carlo estimates the variance from the samples themselves,
+        quasi-Monte Carlo from the spread between the randomizations, whose points are not independent within a sequence.
+        Stops when the interval is narrower than width or when one more batch would exceed max_samples, in which case the interval
+        is wider than requested.
+"""
+@instrument.timed("monte_carlo")
+def monte_carlo(function, a, b, width, sequence="random", confidence=0.95, seed=None, batch=4096, max_samples=10 ** 7, randomizations=16):
+  if a == b:
+    return 0, 0, 0
+
+  if sequence != "random" and randomizations < 2:
+    raise ValueError("The standard error of a quasi-Monte Carlo estimation needs at least 2 randomizations")
+
+  generator = numpy.random.default_rng(seed)
+  z = statistics.NormalDist().inv_cdf(0.5 + confidence / 2)
+  if sequence == "random":
+    randomizations = 1
+    shifts = numpy.zeros(1)
+  elif sequence == "halton":
+    shifts = generator.random(randomizations)
+  else:
+    shifts = generator.integers(0, 2 ** 32, randomizations, dtype=numpy.uint64)
+
+  drawn = 0
+  sums = numpy.zeros(randomizations)
+  count, mean, squares = 0, 0.0, 0.0
+
+  while True:
+    points = draw_points(sequence, drawn, batch, shifts, generator)
+    values = sample(function, (a + (b - a) * points).ravel()).reshape(points.shape) * (b - a)
+    drawn += batch
+
+    if sequence == "random":
+      # Combines the mean and sum of squared deviations of the batch with the running ones (Chan et al.)
+      batch_mean = numpy.mean(values)
+      batch_squares = numpy.sum((values - batch_mean) ** 2)
+      delta = batch_mean - mean
+      total = count + batch
+      mean += delta * batch / total
+      squares += batch_squares + delta ** 2 * count * batch / total
+      count = total
+      result = mean
+      error = math.sqrt(squares / (count - 1) / count) if count > 1 else math.inf
+    else:
+      sums += numpy.sum(values, axis=1)
+      means = sums / drawn
+      result = numpy.mean(means)
+      error = numpy.std(means, ddof=1) / math.sqrt(randomizations)
+
+    if 2 * z * error <= width or (drawn + batch) * randomizations > max_samples:
+      return result, error, drawn * randomizations
+
 """
  Estimates the integral of function over the interval (a, b) using an specified number of rectangles and a random method out of Simpson's method, Trapezium Rule, Left Riemann Sums, Right Riemann Sums, Midpoint RUle and Averaging all of these
     Args:
@@ -207,13 +1077,14 @@ def left_right_tolerance(function, lower_bound, higher_bound, initial,epsilon):
     Notes:
         Assumes the function provided is supported and continous in (a, b)
 """
-def surprise(function, a, b, rectangles):
+@instrument.timed("surprise")
+def surprise(function, a, b, rectangles, cache=None):
   method = ["Simpson's Method", "Trapezium Rule", "Left Riemann Sums", "Right Riemann Sums", "Midpoint Rule", "Averaging Simpson's, Trapezium, Left Riemann Sums, Right Riemann Sums and Midpoint Rule"]
   
   random_num = random.randint(1, 6)
   
   print("\n", method[random_num - 1] + "... ", end="")
-  approx_integral(random_num, function, lower_bound, higher_bound, rectangles)
+  approx_integral(random_num, function, a, b, rectangles, cache)
 
 """
  Explains the user how to input expressions into the program.
@@ -224,7 +1095,7 @@ def instructions():
   print("The user can provide a function of the single variable 'x' as well as an interval of integration and the program will compute its result using the method of choosing.\n")
   print("The home menu will show a list of options from which you can choose.\n")
   print("\tAll your functions should depend only on the variable 'x'\n")
-  print("\tThis program assumes your function is continous over the specified interval. Only definite proper integrals are supported. If the function does not meet one of these requirements the program will encounter either a zero division error or an unexpected result or a math domain error or infinity or similars.\n")
+  print("\tThis program assumes your function is continous over the specified interval. Improper integrals, over infinite intervals (enter inf or -inf as a bound) or of functions that are infinite at a bound, are only supported by the Tanh-Sinh method. If the function does not meet one of these requirements the program will encounter either a zero division error or an unexpected result or a math domain error or infinity or similars.\n")
   print("\tCosine, Sine and Tangent functions are supported and written as cos(x), sin(x) and tan(x)\n")
   print("\tThe functions inverse tangent, inverse sine and inverse cosine are supported and can be written as arctan(x), arcsin(x) and arccos(x) or atan(x), asin(x) and acos(x).\n")
   print("\tThe function natural log is supported and can be used as ln(x) or log(x) which are equivalent\n")
@@ -274,20 +1145,9 @@ def educate():
         Some features were added to the original parser in this function
 """
 def get_function():
-  parser = Parser()
-
   while True:
-    keywords = ["sin", "cos", "tan", "asin", "acos", "atan", "x", "log", "exp", "ceil", "floor", "abs"]
-    numbers = ["1", "2", "3", "4", "5", "6", "7", "8", "9", "0", "E", "PI", "x"]
     try:
-      function = input("\nPlease, enter an expression in terms of the variable 'x' alone > ").replace(" ","").replace("arcsin", "asin").replace("arccos", "acos").replace("arctan", "atan").replace("ln", "log").replace("pi", "PI").replace("e", "E").replace("cEil", "ceil").replace("Exp", "exp").replace("xx", "x*x")
-
-      for keyword in keywords:
-        for number in numbers:
-          function = function.replace(number + keyword, number + "*" + keyword)
-          function = function.replace(number + '(', number + "*" + '(')
-
-      function = parser.parse(function).simplify({})
+      function = parse_function(input("\nPlease, enter an expression in terms of the variable 'x' alone > "))
 
       print("This is the computer representation of your function:", function.toString())
 
@@ -301,7 +1161,7 @@ def get_function():
       print("\n Try again: ")
       continue
 
-    return function.simplify({})
+    return function
 
 """
  Obtains the integration bounds from the user
@@ -315,9 +1175,6 @@ def get_bounds():
       print("\nPlease enter the bounds of the integral: ")
       a = float(input("First (Usually lower) bound a > "))
       b = float(input("Second (Usually higher) bound b > "))
-      if abs(a) == float('inf') or abs(b) == float('inf'):
-        print("The program does not support improper integrals yet!")
-        continue
       break
     except:
       print("\n Your input should be a number. Try again")
@@ -352,6 +1209,145 @@ def get_rectangles():
       continue
   return rectangles
 
+"""
+ Obtains the tolerance of an approximation by the user
+    Returns:
+        A positive float number that represents the maximum error the user will accept in the calculation of the integral
+"""
+def get_tolerance():
+  while True:
+    try:
+      tolerance = float(input("What is the tolerance of this approximation? > "))
+      
+      if tolerance <= 0:
+        print("\nYour input should be a real positive number. Try again")
+      else:
+        break
+    except:
+      print("\nYour input should be a real positive number. Try again")
+      continue
+  return tolerance
+
+METHODS = ["simpson", "trapezium", "left", "right", "midpoint", "average", "tolerance", "adaptive", "gauss_legendre", "romberg", "monte_carlo", "quasi_monte_carlo", "exact", "tanh_sinh"]
+MAX_EVALUATIONS = 10 ** 8
+FALLBACK_TOLERANCE = 1e-10
+
+"""
+ Turns the numbers of a result of integrate into plain Python numbers, so a result is the same whether it was cached or not
+    Args:
+        result: A dictionary with the "result" and optionally the "error_bound" and "evaluations" of an integral
+    Returns:
+        The same dictionary with float numbers, or complex ones for complex results, and an integer number of evaluations
+"""
+def plain(result):
+  return {name: (int(value) if name == "evaluations" else value if isinstance(value, complex) else float(value)) for name, value in result.items()}
+
+"""
+ Estimates an integral without interacting with the user
+    Args:
+        function: A py_expression expression 
+        a: A float number that represents the left bound of integration
+        b: A float number that represents the right bound of integration
+        method: One of the names in METHODS
+        rectangles: A positive integer that represents the number of subintervals, required by every method except "adaptive", "monte_carlo", "quasi_monte_carlo", "exact" and "tanh_sinh"
+        tolerance: A float small positive number that represents the desired error, required by "tolerance", "adaptive", "romberg", "monte_carlo", "quasi_monte_carlo" and "tanh_sinh", for
+        "monte_carlo" and "quasi_monte_carlo" it is the half width of the 95% confidence interval. "exact" only uses it when the function has no closed form,
+        FALLBACK_TOLERANCE by default
+        workers: An optional positive integer, the number of worker processes used by the uniform rules, or an executor whose
+        workers are reused, see estimate
+        chunk_size: A positive integer that represents the number of points each worker evaluates at a time
+        cache: An optional cache.ResultCache where results are looked up before computing them and stored afterwards
+        seed: An optional integer that makes "monte_carlo" and "quasi_monte_carlo" reproducible, their results are only cached when it is given
+    Returns:
+        A dictionary with the estimation of the integral under "result", and the "error_bound" and number of "evaluations" for the methods that report them
+        "exact" integrates the functions recognized by closed_form.analyze with their antiderivative, with no evaluations and an
+        error_bound of 0, and falls back to "adaptive" for every other function
+    Notes:
+        Raises ValueError when the method is unknown or an argument it needs is missing, and when a bound is infinite and the method
+        is not "tanh_sinh"
+        The uniform rules are cached through the left, right and midpoint rules they are made of, so for example a trapezium rule is
+        answered from the cache after the left and right rules with the same rectangles were computed, and only the missing ones
+        are computed otherwise
+"""
+@instrument.timed("integrate")
+def integrate(function, a, b, method, rectangles=None, tolerance=None, workers=None, chunk_size=CHUNK_SIZE, cache=None, seed=None):
+  if method not in METHODS:
+    raise ValueError("Unknown method '" + str(method) + "', it should be one of: " + ", ".join(METHODS))
+  if rectangles is None and method not in ["adaptive", "monte_carlo", "quasi_monte_carlo", "exact", "tanh_sinh"]:
+    raise ValueError("The method '" + method + "' needs a number of rectangles")
+  if rectangles is not None and rectangles < 1:
+    raise ValueError("The number of rectangles should be a positive integer")
+  if tolerance is None and method in ["tolerance", "adaptive", "romberg", "monte_carlo", "quasi_monte_carlo", "tanh_sinh"]:
+    raise ValueError("The method '" + method + "' needs a tolerance")
+  if tolerance is not None and tolerance <= 0:
+    raise ValueError("The tolerance should be a real positive number")
+  if (math.isinf(a) or math.isinf(b)) and method != "tanh_sinh":
+    raise ValueError("Only the method 'tanh_sinh' supports infinite bounds")
+  a, b = float(a), float(b)
+
+  if cache is not None and not (method in ["monte_carlo", "quasi_monte_carlo"] and seed is None):
+    key = (function.toString(), a, b, method, rectangles, tolerance, seed)
+    if method in RULES:
+      results = {}
+      for component in RULE_COMPONENTS[method]:
+        cached = cache.get((function.toString(), a, b, component, rectangles, None))
+        if cached is not None:
+          results[component] = cached["result"]
+
+      missing = [component for component in RULE_COMPONENTS[method] if component not in results]
+      if missing:
+        computed = estimate(function, a, b, rectangles, missing, workers, chunk_size)
+        for component, value in computed.items():
+          cache.put((function.toString(), a, b, component, rectangles, None), {"result": value})
+        results.update(computed)
+
+      complete_rules(results)
+      return plain({"result": results[method]})
+
+    cached = cache.get(key)
+    if cached is not None:
+      return cached
+    result = plain(compute(function, a, b, method, rectangles, tolerance, workers, chunk_size, seed))
+    cache.put(key, result)
+    return result
+
+  return plain(compute(function, a, b, method, rectangles, tolerance, workers, chunk_size, seed))
+
+"""
+ Runs one of the METHODS, once integrate checked its arguments and looked it up in the cache
+    Args:
+        The same as integrate, except for cache
+    Returns:
+        The dictionary returned by integrate, with NumPy numbers
+"""
+def compute(function, a, b, method, rectangles, tolerance, workers, chunk_size, seed):
+  if method in RULES:
+    return {"result": estimate(function, a, b, rectangles, [method], workers, chunk_size)[method]}
+  elif method == "tolerance":
+    result, error, evaluations = left_right_refine(function, a, b, rectangles, tolerance, MAX_EVALUATIONS)
+    return {"result": result, "error_bound": error, "evaluations": evaluations}
+  elif method == "adaptive":
+    result, error, evaluations = adaptive(function, a, b, tolerance)
+    return {"result": result, "error_bound": error, "evaluations": evaluations}
+  elif method == "gauss_legendre":
+    return {"result": gauss_legendre(function, a, b, rectangles)}
+  elif method == "romberg":
+    result, tableau = romberg(function, a, b, rectangles, tolerance)
+    error = math.fabs(tableau[-1][-1] - tableau[-2][-1]) if len(tableau) > 1 else 0
+    return {"result": result, "error_bound": error}
+  elif method in ["monte_carlo", "quasi_monte_carlo"]:
+    result, error, samples = monte_carlo(function, a, b, 2 * tolerance, "random" if method == "monte_carlo" else "sobol", seed=seed)
+    return {"result": result, "error_bound": error, "evaluations": samples}
+  elif method == "exact":
+    result = closed_form(function, a, b)
+    if result is not None:
+      return {"result": result, "error_bound": 0.0, "evaluations": 0}
+    result, error, evaluations = adaptive(function, a, b, tolerance or FALLBACK_TOLERANCE)
+    return {"result": result, "error_bound": error, "evaluations": evaluations}
+  elif method == "tanh_sinh":
+    result, error, evaluations = tanh_sinh(function, a, b, tolerance)
+    return {"result": result, "error_bound": error, "evaluations": evaluations}
+
 """
  Handles integral approximation using other functions
     Args:
@@ -359,125 +1355,245 @@ def get_rectangles():
         lower_bound: A float number that represents the left bound of integration
         higher_bound: A float number that represents the right bound of integration
         rectangles: A positive integer that represents the number of subintervals considered in the estimation of the integral.
+        cache: An optional cache.ResultCache that remembers the results, so choosing another method on the same function reuses them
     Notes:
         Assumes the function provided is supported and continous in (lower_bound, higher_bound)
+        Only Tanh-Sinh (selection 13) accepts infinite bounds, the other selections ask for new bounds
         Prints the results to the screen
 """
-def approx_integral(selection, function, lower_bound, higher_bound, rectangles):
+def approx_integral(selection, function, lower_bound, higher_bound, rectangles, cache=None):
+  if selection != 13 and (math.isinf(lower_bound) or math.isinf(higher_bound)):
+    print("\nOnly Tanh-Sinh supports infinite bounds, choose it or enter new bounds\n")
+    input("Press enter to continue > ")
+    return
+
   if selection == 1:
-    print("\nThe result is: ", simpson(function, lower_bound, higher_bound, rectangles), "\n")
+    print("\nThe result is: ", integrate(function, lower_bound, higher_bound, "simpson", rectangles, cache=cache)["result"], "\n")
     input("Press enter to continue > ")
 
   elif selection == 2:
-    print("\nThe result is: ", trapezium(function, lower_bound, higher_bound, rectangles), "\n")
+    print("\nThe result is: ", integrate(function, lower_bound, higher_bound, "trapezium", rectangles, cache=cache)["result"], "\n")
     input("Press enter to continue > ")
 
   elif selection == 3:
-    print("\nThe result is: ", left(function, lower_bound, higher_bound, rectangles), "\n")
+    print("\nThe result is: ", integrate(function, lower_bound, higher_bound, "left", rectangles, cache=cache)["result"], "\n")
     input("Press enter to continue > ")
 
   elif selection == 4:
-    print("\nThe result is: ", right(function, lower_bound, higher_bound, rectangles), "\n")
+    print("\nThe result is: ", integrate(function, lower_bound, higher_bound, "right", rectangles, cache=cache)["result"], "\n")
     input("Press enter to continue > ")
 
   elif selection == 5:
-    print("\nThe result is: ", midpoint(function, lower_bound, higher_bound, rectangles), "\n")
+    print("\nThe result is: ", integrate(function, lower_bound, higher_bound, "midpoint", rectangles, cache=cache)["result"], "\n")
     input("Press enter to continue > ")
 
   elif selection == 6:
-    print("\nThe result is: ", average(function, lower_bound, higher_bound, rectangles), "\n")
+    print("\nThe result is: ", integrate(function, lower_bound, higher_bound, "average", rectangles, cache=cache)["result"], "\n")
     input("Press enter to continue > ")
 
   elif selection == 7:
-    while True:
-      try:
-        tolerance = float(input("What is the tolerance of this approximation? > "))
-        
-        if tolerance <= 0:
-          print("\nYour input should be a real positive number. Try again")
-        else:
-          break
-      except:
-        print("\nYour input should be a real positive number. Try again")
-        continue
-
+    tolerance = get_tolerance()
     print("\nThe result is: ", left_right_tolerance(function, lower_bound, higher_bound, rectangles, tolerance), "\n")
     input("Press any key to continue > ")
 
+  elif selection == 8:
+    tolerance = get_tolerance()
+    result = integrate(function, lower_bound, higher_bound, "adaptive", tolerance=tolerance, cache=cache)
+    print("\nThe result is: ", result["result"])
+    print("Estimated error:", result["error_bound"])
+    print("Function evaluations:", result["evaluations"], "\n")
+    input("Press enter to continue > ")
+
+  elif selection == 9:
+    print("\nThe result is: ", integrate(function, lower_bound, higher_bound, "gauss_legendre", rectangles, cache=cache)["result"], "\n")
+    input("Press enter to continue > ")
+
+  elif selection == 10:
+    tolerance = get_tolerance()
+    result, tableau = romberg(function, lower_bound, higher_bound, rectangles, tolerance)
+    print("\nRomberg tableau:")
+    for row in tableau:
+      print("  ".join(str(value) for value in row))
+    print("\nThe result is: ", result, "\n")
+    input("Press enter to continue > ")
+
+  elif selection == 11:
+    tolerance = get_tolerance()
+    result, error, samples = monte_carlo(function, lower_bound, higher_bound, 2 * tolerance, "sobol")
+    print("\nThe result is: ", result)
+    print("Standard error:", error)
+    print("Function evaluations:", samples, "\n")
+    input("Press enter to continue > ")
+
+  elif selection == 12:
+    result = integrate(function, lower_bound, higher_bound, "exact", cache=cache)
+    if result["evaluations"] == 0:
+      print("\nThe exact result is: ", result["result"], "\n")
+    else:
+      print("\nThe antiderivative of the function is not recognized, estimating it with Adaptive Gauss-Kronrod instead")
+      print("The result is: ", result["result"])
+      print("Estimated error:", result["error_bound"], "\n")
+    input("Press enter to continue > ")
+
+  elif selection == 13:
+    tolerance = get_tolerance()
+    result = integrate(function, lower_bound, higher_bound, "tanh_sinh", tolerance=tolerance, cache=cache)
+    print("\nThe result is: ", result["result"])
+    print("Estimated error:", result["error_bound"])
+    print("Function evaluations:", result["evaluations"], "\n")
+    input("Press enter to continue > ")
+
 ########################################################################
 ################ ---------------- main ---------------- ################
 ########################################################################
-print("----- Welcome to My Integral Estimator -----".center(80))
-
-first_time = True
-function = None
-lower_bound = 0
-higher_bound = 0
-
-while True:
-  print("\nChoose a technique for the estimation of your integral: ")
-
-  print("1. Simpson's Rule")
-  print("2. Trapezium Rule")
-  print("3. Left Riemann Sums")
-  print("4. Right Riemann Sums")
-  print("5. Midpoint Rule")
-  print("6. Average 1-5")
-  print("7. Left and Right Riemann Sums with Tolerance (Works well for any function but in order to guarantee tolerance the function provided must have monotone behaviour)")
-  print("8. Surprise me!")
-  print("9. Instructions and Examples")
-  print("10. Educate me")
-  print("11. Another Function")
-  print("12. New Bounds")
-  print("13. Change Number of Rectangles to use")
-  print("14. Quit")
-
-  print()
-
-  try:
-    selection = int(input("Selection > "))
-  except:
-    continue
-
-  if selection == 9:
-    instructions()
-    continue
-  elif selection == 10:
-    educate()
-    continue
+"""
+ Runs the interactive menu of the integral estimator until the user quits
+    Args:
+        show_profile: A boolean, when True a breakdown of the time and function evaluations of every estimator is printed after each result
+        cache_path: An optional path of a SQLite file where results are remembered between sessions
+        cache_ttl: An optional number of seconds after which remembered results are computed again
+"""
+def menu(show_profile=False, cache_path=None, cache_ttl=None):
+  print("----- Welcome to My Integral Estimator -----".center(80))
 
-  if first_time:
-    first_time = False
-    if selection == 14:
-      print_goodbye()
-      break
-    function = get_function()
-    lower_bound, higher_bound = get_bounds()
-    rectangles = get_rectangles() 
-    if selection == 11 or selection == 12 or selection == 13:
+  cache = ResultCache(ttl=cache_ttl, path=cache_path)
+
+  first_time = True
+  function = None
+  lower_bound = 0
+  higher_bound = 0
+
+  while True:
+    print("\nChoose a technique for the estimation of your integral: ")
+
+    print("1. Simpson's Rule")
+    print("2. Trapezium Rule")
+    print("3. Left Riemann Sums")
+    print("4. Right Riemann Sums")
+    print("5. Midpoint Rule")
+    print("6. Average 1-5")
+    print("7. Left and Right Riemann Sums with Tolerance (Works well for any function but in order to guarantee tolerance the function provided must have monotone behaviour)")
+    print("8. Adaptive Gauss-Kronrod with Tolerance (Concentrates the evaluations where the function is hard to integrate)")
+    print("9. Gauss-Legendre Quadrature (20 points in every rectangle, very exact for smooth functions)")
+    print("10. Romberg Integration with Tolerance (Extrapolates the Trapezium Rule while halving the rectangles)")
+    print("11. Quasi-Monte Carlo with Tolerance (Averages the function at well spread random points until the 95% confidence interval is small enough)")
+    print("12. Exact Integral (Uses the antiderivative of polynomials, exponentials, sines, cosines and logarithms, estimates any other function)")
+    print("13. Tanh-Sinh with Tolerance (Handles functions that are infinite at a bound, such as 1/sqrt(x) from 0, and infinite bounds)")
+    print("14. Surprise me!")
+    print("15. Instructions and Examples")
+    print("16. Educate me")
+    print("17. Another Function")
+    print("18. New Bounds")
+    print("19. Change Number of Rectangles to use")
+    print("20. Quit")
+
+    print()
+
+    try:
+      selection = int(input("Selection > "))
+    except:
       continue
 
-  if selection in [1, 2, 3, 4, 5, 6, 7]:
-    approx_integral(selection, function, lower_bound, higher_bound, rectangles)
+    if selection == 15:
+      instructions()
+      continue
+    elif selection == 16:
+      educate()
+      continue
 
-  elif selection == 8:
-    surprise(function, lower_bound, higher_bound, rectangles)
+    if first_time:
+      first_time = False
+      if selection == 20:
+        print_goodbye()
+        break
+      function = get_function()
+      lower_bound, higher_bound = get_bounds()
+      rectangles = get_rectangles() 
+      if selection == 17 or selection == 18 or selection == 19:
+        continue
 
-  elif selection == 9:
-    instructions()
+    if selection in [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13]:
+      with instrument.profile() if show_profile else contextlib.nullcontext() as report:
+        approx_integral(selection, function, lower_bound, higher_bound, rectangles, cache)
+      if show_profile:
+        print(report.format())
 
-  elif selection == 10:
-    educate()
+    elif selection == 14:
+      with instrument.profile() if show_profile else contextlib.nullcontext() as report:
+        surprise(function, lower_bound, higher_bound, rectangles, cache)
+      if show_profile:
+        print(report.format())
 
-  elif selection == 11:
-    function = get_function()
+    elif selection == 15:
+      instructions()
 
-  elif selection == 12:
-    lower_bound, higher_bound = get_bounds()
+    elif selection == 16:
+      educate()
 
-  elif selection == 13:
-    rectangles = get_rectangles()
+    elif selection == 17:
+      function = get_function()
 
-  elif selection == 14:
-    print_goodbye()
-    break
\ No newline at end of file
+    elif selection == 18:
+      lower_bound, higher_bound = get_bounds()
+
+    elif selection == 19:
+      rectangles = get_rectangles()
+
+    elif selection == 20:
+      print_goodbye()
+      break
+
+"""
+ Entry point of the program. Without arguments it runs the interactive menu, the batch command integrates a file of jobs without interaction, the cumulative command writes a table of the integral up to many points and the serve command answers integration requests over a local socket
+    Args:
+        argv: A list with the command line arguments, by default the ones the program was run with
+"""
+def main(argv=None):
+  parser = argparse.ArgumentParser(description="My Integral Estimator")
+  parser.add_argument("--profile", action="store_true", help="print the time and function evaluations of every estimator after each result")
+  parser.add_argument("--cache", help="SQLite file where results are remembered between sessions")
+  parser.add_argument("--cache-ttl", type=float, help="seconds after which remembered results are computed again")
+  commands = parser.add_subparsers(dest="command")
+
+  batch_parser = commands.add_parser("batch", help="integrate every job of a JSONL or CSV file")
+  batch_parser.add_argument("jobs", nargs="?", default="-", help="file with one job per line or row, '-' reads standard input")
+  batch_parser.add_argument("-o", "--output", default="-", help="file where the results are written, '-' writes to standard output")
+  batch_parser.add_argument("--format", choices=["jsonl", "csv"], help="format of the jobs and results, guessed from the file extension when omitted")
+  batch_parser.add_argument("--workers", type=int, help="number of worker processes used by the uniform rules, by default they run in this process")
+  batch_parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="number of points each worker evaluates at a time")
+
+  serve_parser = commands.add_parser("serve", help="answer integration requests, one JSON object per line, over a local socket")
+  serve_parser.add_argument("--host", default="127.0.0.1", help="address to listen on, the local machine by default")
+  serve_parser.add_argument("--port", type=int, default=8765)
+  serve_parser.add_argument("--workers", type=int, help="number of worker processes, one per processor by default")
+  serve_parser.add_argument("--max-pending", type=int, default=1000, help="number of computations in flight after which new requests are rejected")
+  serve_parser.add_argument("--max-per-connection", type=int, default=64, help="number of unanswered requests after which a connection is not read")
+
+  cumulative_parser = commands.add_parser("cumulative", help="write the integral from a up to every endpoint of the rectangles as CSV")
+  cumulative_parser.add_argument("expression")
+  cumulative_parser.add_argument("a", type=float)
+  cumulative_parser.add_argument("b", type=float)
+  cumulative_parser.add_argument("rectangles", type=int)
+  cumulative_parser.add_argument("--rule", choices=RULES, default="trapezium")
+  cumulative_parser.add_argument("-o", "--output", default="-", help="file where the table is written, '-' writes to standard output")
+
+  args = parser.parse_args(argv)
+
+  if args.command == "batch":
+    import batch
+    batch.run(args.jobs, args.output, args.format, args.workers, args.chunk_size, args.profile, args.cache, args.cache_ttl)
+  elif args.command == "cumulative":
+    function = parse_function(args.expression)
+    if args.output == "-":
+      write_cumulative(sys.stdout, function, args.a, args.b, args.rectangles, args.rule)
+    else:
+      with open(args.output, "w", newline="") as output:
+        write_cumulative(output, function, args.a, args.b, args.rectangles, args.rule)
+  elif args.command == "serve":
+    import server
+    server.run(args.host, args.port, args.workers, args.max_pending, args.max_per_connection)
+  else:
+    menu(args.profile, args.cache, args.cache_ttl)
+
+if __name__ == "__main__":
+  main()
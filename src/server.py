@@ -0,0 +1,184 @@
+from concurrent.futures import ProcessPoolExecutor
+from expression import normalize_expression
+import batch
+import asyncio
+import collections
+import json
+import time
+
+LATENCY_SAMPLES = 10000
+
+"""
+ Integrates one job in a worker process
+    Args:
+        job: A dictionary with the fields of a batch job
+    Returns:
+        The output of the job as produced by batch.integrate_jobs
+"""
+def solve(job):
+  return next(batch.integrate_jobs([job]))
+
+"""
+ Computes the key under which identical jobs are coalesced
+    Args:
+        job: A dictionary with the fields of a batch job
+    Returns:
+        A tuple with the normalized expression, bounds, method, rectangles, tolerance and seed, or None when the job is malformed, in which
+        case it is solved on its own and fails with the reason
+"""
+def job_key(job):
+  try:
+    return (normalize_expression(job["expression"]), float(job["a"]), float(job["b"]), job.get("method", "simpson"), batch.to_number(job.get("rectangles"), int), batch.to_number(job.get("tolerance"), float), batch.to_number(job.get("seed"), int))
+  except Exception:
+    return None
+
+"""
+ Finds a percentile of a sorted list of numbers
+    Args:
+        values: A sorted non-empty list of numbers
+        fraction: A float number between 0 and 1
+    Returns:
+        The value below which that fraction of the values lies
+"""
+def percentile(values, fraction):
+  return values[min(len(values) - 1, int(fraction * len(values)))]
+
+"""
+ Integration service that answers JSON requests, one per line, over a local socket
+    Notes:
+        Every line is either a batch job, optionally with an "id" that is echoed back, or {"command": "stats"}. Jobs run in a pool of
+        worker processes; a job identical to one that is still running waits for that computation instead of starting another one.
+        Answers are written as soon as they are ready, so they may come back in a different order than the requests.
+"""
+class IntegrationServer:
+  def __init__(self, workers=None, max_pending=1000, max_per_connection=64):
+    self.executor = ProcessPoolExecutor(workers)
+    self.max_pending = max_pending
+    self.max_per_connection = max_per_connection
+    self.in_flight = {}
+    self.pending = 0
+    self.latencies = collections.deque(maxlen=LATENCY_SAMPLES)
+    self.counts = {"requests": 0, "computed": 0, "coalesced": 0, "rejected": 0, "failed": 0}
+
+  """
+   Reports the activity of the server
+      Returns:
+          A dictionary with the request counters, the number of computations in flight and the 50th, 90th and 99th percentiles of
+          the latency of the last LATENCY_SAMPLES requests in seconds
+  """
+  def stats(self):
+    report = dict(self.counts)
+    report["in_flight"] = self.pending
+    latencies = sorted(self.latencies)
+    for name, fraction in [("p50", 0.5), ("p90", 0.9), ("p99", 0.99)]:
+      report["latency_" + name] = percentile(latencies, fraction) if latencies else None
+    return report
+
+  """
+   Integrates a job, joining the computation of an identical job when there is one in flight
+      Args:
+          job: A dictionary with the fields of a batch job
+      Returns:
+          The output of the job
+  """
+  async def integrate(self, job):
+    key = job_key(job)
+    future = self.in_flight.get(key) if key is not None else None
+
+    if future is not None:
+      self.counts["coalesced"] += 1
+    elif self.pending >= self.max_pending:
+      self.counts["rejected"] += 1
+      return dict(job, failure="The server is busy, try again later")
+    else:
+      self.counts["computed"] += 1
+      future = asyncio.get_running_loop().run_in_executor(self.executor, solve, job)
+      self.pending += 1
+      future.add_done_callback(self.finished)
+      if key is not None:
+        self.in_flight[key] = future
+        future.add_done_callback(lambda _: self.in_flight.pop(key, None))
+
+    output = dict(job)
+    solved = await asyncio.shield(future)
+    for name in ["result", "error_bound", "evaluations", "failure"]:
+      if name in solved:
+        output[name] = solved[name]
+    return output
+
+  def finished(self, future):
+    self.pending -= 1
+
+  """
+   Answers one request line and records its latency
+  """
+  async def answer(self, line, writer, limit):
+    start = time.perf_counter()
+    try:
+      request = json.loads(line)
+      if request.get("command") == "stats":
+        response = self.stats()
+      else:
+        self.counts["requests"] += 1
+        response = await self.integrate(request)
+        self.latencies.append(time.perf_counter() - start)
+    except Exception as error:
+      response = {"failure": str(error) or type(error).__name__}
+
+    if "failure" in response:
+      self.counts["failed"] += 1
+    try:
+      writer.write((json.dumps(response) + "\n").encode())
+      await writer.drain()
+    except ConnectionError:
+      pass
+    finally:
+      limit.release()
+
+  """
+   Reads the requests of one connection, never keeping more than max_per_connection of them unanswered
+  """
+  async def handle(self, reader, writer):
+    limit = asyncio.Semaphore(self.max_per_connection)
+    tasks = set()
+    try:
+      while True:
+        await limit.acquire()
+        line = await reader.readline()
+        if not line:
+          limit.release()
+          break
+        if not line.strip():
+          limit.release()
+          continue
+        task = asyncio.ensure_future(self.answer(line, writer, limit))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+      if tasks:
+        await asyncio.wait(tasks)
+    finally:
+      writer.close()
+
+  """
+   Accepts connections until the program is interrupted
+      Args:
+          host: The address to listen on, the local machine by default
+          port: The port to listen on
+  """
+  async def serve(self, host="127.0.0.1", port=8765):
+    server = await asyncio.start_server(self.handle, host, port)
+    print("Integration server listening on", host + ":" + str(port), flush=True)
+    try:
+      async with server:
+        await server.serve_forever()
+    finally:
+      self.executor.shutdown(cancel_futures=True)
+
+"""
+ Runs the integration server until the program is interrupted, see IntegrationServer
+"""
+def run(host="127.0.0.1", port=8765, workers=None, max_pending=1000, max_per_connection=64):
+  try:
+    asyncio.run(IntegrationServer(workers, max_pending, max_per_connection).serve(host, port))
+  except KeyboardInterrupt:
+    pass
@@ -0,0 +1,51 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from closed_form import closed_form
+from expression import parse_function
+import math
+import pytest
+
+"""
+ Functions with an antiderivative, their interval and the exact value of their integral
+"""
+@pytest.mark.parametrize("text, a, b, exact", [
+  ("3x^3-2x^2+x-5", 0, 2, 3 * 2 ** 4 / 4 - 2 * 2 ** 3 / 3 + 2 ** 2 / 2 - 5 * 2),
+  ("sin(2x+1)*3", 1, 2, 1.5 * (math.cos(3) - math.cos(5))),
+  ("exp(x)+ln(x)", 1, 2, math.exp(2) - math.exp(1) + 2 * math.log(2) - 1),
+  ("(x+1)^2/x", 1, 2, 1.5 + 2 + math.log(2)),
+  ("1/(x+1)", 1, 2, math.log(1.5)),
+  ("2^x", 0, 1, 1 / math.log(2)),
+  ("sqrt(x)^2", 0, 1, 0.5),
+  ("x/x", 1, 2, 1),
+  ("x/2", -1, 1, 0),
+  ("x^2", 2, 0, -8 / 3),
+])
+def test_recognized(text, a, b, exact):
+  assert closed_form(parse_function(text), a, b) == pytest.approx(exact, rel=1e-14, abs=1e-14)
+
+"""
+ Functions that are not defined over the whole interval, even when their terms cancel or merge into ones that are
+"""
+@pytest.mark.parametrize("text, a, b", [
+  ("sqrt(x)^2", -1, 1),
+  ("x^0.5*x^0.5", -1, 1),
+  ("x^1.5*x^(0-0.5)", -1, 1),
+  ("x/x", -1, 1),
+  ("x^2*x^(0-2)", -1, 1),
+  ("log(x)-log(x)", -1, 1),
+  ("1/x", -1, 1),
+  ("1/(x-1)", 0, 2),
+  ("sqrt(x)", -1, 1),
+])
+def test_undefined(text, a, b):
+  assert closed_form(parse_function(text), a, b) is None
+
+"""
+ Functions without a recognized antiderivative, which are left to numeric quadrature
+"""
+@pytest.mark.parametrize("text", ["x*exp(x)", "sin(x)^2", "abs(x)", "log(x,2)"])
+def test_unrecognized(text):
+  assert closed_form(parse_function(text), 1, 2) is None